@@ -1,9 +1,12 @@
 """
-Finalized algorithm for pathfinding, uses dijkstra's.
+Finalized algorithm for pathfinding, uses the contraction hierarchy
+(falls back to dijkstra's for plain graphs).
 """
 
 # ----------------- imports ----------------- #
-import json
+import data_context  # also puts programs/ on sys.path for dijkstras
+from contraction import ContractionHierarchy
+from dijkstras import dijkstra
 
 # ----------------- algorithm ----------------- #
 """
@@ -13,14 +16,17 @@ import json
 
 def path_find(graph, start, end):
     # convert start and end from name to number #
-    with open("../datasets/secondary.json", "r") as f:
-        secondary = json.load(f)
-    names = dict((v, k) for k, v in secondary.items())
+    context = data_context.get_context()
+    secondary = context.names
+    names = context.name_to_node
     start = names[start]
     end = names[end]
 
     # get path #
-    distance, path = dijkstra(graph, start, end)
+    if isinstance(graph, ContractionHierarchy):
+        distance, path = graph.query(start, end)
+    else:
+        distance, path = dijkstra(graph, start, end)
 
     # get path string #
     # setup
@@ -40,8 +46,6 @@ def path_find(graph, start, end):
         "N": "Namboku",
         "F": "Fukutoshin",
     }
-    with open("../datasets/secondary.json", "r") as f:
-        secondary = json.load(f)
 
     # get string
     path_string = ""
@@ -102,47 +106,3 @@ def path_find(graph, start, end):
 
     # returns #
     return distance, path, path_string
-
-
-"""
-    Finds path.
-"""
-
-
-def dijkstra(graph, start, end):
-    # setup dijkstra's
-    distances = {node: 1e7 for node in graph.nodes()}
-    distances[start] = 0
-    pq = [(0, start)]  # priority queue of nodes to visit
-    visited = set()
-    previous = {}
-
-    # while unvisited nodes exist
-    while len(pq) > 0:
-        # visit node
-        current_distance, current_node = pq.pop(0)
-
-        # break if finished
-        if current_node == end:
-            break
-        elif current_node not in visited:
-            visited.add(current_node)
-
-            for n in graph.neighbors(current_node):
-                weight = graph[current_node][n]["weight"]
-                distance_to_neightbor = current_distance + weight
-
-                if distance_to_neightbor < distances[n]:
-                    distances[n] = distance_to_neightbor
-                    previous[n] = current_node
-                    pq.append((distance_to_neightbor, n))
-
-    # get path
-    path = []
-    temp = end
-    while temp != start:
-        path.insert(0, temp)
-        temp = previous[temp]
-    path.insert(0, start)
-
-    return distances[end], path
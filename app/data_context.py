@@ -0,0 +1,139 @@
+"""
+    Process-wide cache of the datasets used to answer route requests.
+"""
+
+
+# ----------------- imports ----------------- #
+import json
+import os
+import sys
+import threading
+import time
+
+import networkx as nx
+
+# shared routing engines (dijkstras.py, contraction.py) live in programs/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "programs"))
+from contraction import ContractionHierarchy  # noqa: E402
+
+
+# ----------------- constants ----------------- #
+DATASETS_DIR = "../datasets"
+SOURCES = {
+    "graphml": "tokyometro.graphml",
+    "stations": "clean_stations.json",
+    "names": "secondary.json",
+    "positions": "station_positions.json",
+    "intersections": "full_intersections.json",
+}
+# contraction hierarchy of the graphml, rebuilt when its edges change
+HIERARCHY = "tokyometro.ch.npz"
+# seconds between mtime checks; requests inside the window touch no files
+CHECK_INTERVAL = 2.0
+# image height used to flip pixel y coordinates
+IMAGE_HEIGHT = 1785
+
+
+# ----------------- context ----------------- #
+"""
+    Everything loaded from disk for one version of the datasets.
+"""
+
+
+class DataContext:
+    def __init__(self, mtimes):
+        self.mtimes = mtimes
+
+        # routing graph + name maps
+        self.graph = nx.read_graphml(_source_path("graphml"))
+        self.hierarchy = ContractionHierarchy.load_or_build(
+            self.graph, os.path.join(DATASETS_DIR, HIERARCHY)
+        )
+        self.names = _read_json("names")
+        self.name_to_node = dict((v, k) for k, v in self.names.items())
+
+        # visualizer data
+        self.stations = _read_json("stations")
+        self.positions = _read_json("positions")
+        for i in self.positions:
+            self.positions[i][1] = IMAGE_HEIGHT - self.positions[i][1]
+        station_lookup = _read_json("intersections")
+        self.station_lookup = {k: list(v.keys()) for k, v in station_lookup.items()}
+        self.map_graph = _build_map_graph(self.stations, self.positions)
+        self.map_pos = nx.get_node_attributes(self.map_graph, "pos")
+        self.map_node_index, self.map_edge_index = build_indexes(self.map_graph)
+
+
+_context = None
+_last_check = 0.0
+_lock = threading.Lock()
+
+
+"""
+    Returns the shared DataContext, (re)loading it on first use or when a
+    source file's mtime changed. mtimes are checked at most once every
+    CHECK_INTERVAL seconds.
+"""
+
+
+def get_context():
+    global _context, _last_check
+    now = time.monotonic()
+    context = _context
+    if context is not None and now - _last_check < CHECK_INTERVAL:
+        return context
+
+    with _lock:
+        if _context is not None and now - _last_check < CHECK_INTERVAL:
+            return _context
+        mtimes = _source_mtimes()
+        if _context is None or _context.mtimes != mtimes:
+            _context = DataContext(mtimes)
+        _last_check = time.monotonic()
+        return _context
+
+
+# ----------------- helpers ----------------- #
+def _source_path(key):
+    return os.path.join(DATASETS_DIR, SOURCES[key])
+
+
+def _source_mtimes():
+    return {key: os.stat(_source_path(key)).st_mtime_ns for key in SOURCES}
+
+
+def _read_json(key):
+    with open(_source_path(key), "r") as f:
+        return json.load(f)
+
+
+def _build_map_graph(data, positions):
+    # define graph
+    graph = nx.Graph()
+
+    # load with positions
+    for node, neighbors in data.items():
+        graph.add_node(node, pos=(positions[node][0], positions[node][1]))
+        for neighbor, weight in neighbors.items():
+            graph.add_edge(node, neighbor, weight=weight)
+    return graph
+
+
+"""
+    Builds node -> index and undirected edge -> index lookups for a graph.
+    `edge_index.edges` keeps the graph's edge list for mapping back.
+"""
+
+
+class EdgeIndex(dict):
+    def __init__(self, edges):
+        super().__init__()
+        self.edges = list(edges)
+        for i, (u, v) in enumerate(self.edges):
+            self[(u, v)] = i
+            self[(v, u)] = i
+
+
+def build_indexes(graph):
+    node_index = {node: i for i, node in enumerate(graph.nodes())}
+    return node_index, EdgeIndex(graph.edges())
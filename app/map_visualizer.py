@@ -8,189 +8,267 @@ import networkx as nx
 import matplotlib
 
 matplotlib.use("Agg")
-import matplotlib.pyplot as plt
-import json
 import base64
-import io
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import data_context  # also puts programs/ on sys.path for map_layers
+from map_layers import encode_png, render_base_layer, render_overlay
 
 
 # ----------------- constants ----------------- #
 BASE_COLOR = "gainsboro"
+NODE_SIZE = 50
+FONT_SIZE = 8
+DPI = 100
+
+# rendered routes kept in memory (base64 payloads, least recently used evicted)
+RENDER_CACHE_SIZE = 256
+# optional on-disk tier shared across processes/restarts (unset = disabled)
+RENDER_CACHE_DIR = os.environ.get("TOKYOMETRO_RENDER_CACHE_DIR")
+
+
+# ----------------- render cache ----------------- #
+"""
+    Thread-safe bounded LRU mapping render keys to base64 PNG payloads.
+"""
+
+
+class RenderCache:
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.entries.get(key)
+            if value is not None:
+                self.entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+
+_render_cache = RenderCache(RENDER_CACHE_SIZE)
+
+# static grey map, rasterized once per dataset version
+_base_layer = None
+_base_layer_key = None
+_base_layer_lock = threading.Lock()
 
 
 # ----------------- functions ----------------- #
 """
-    Visualizes a given path (assumes dijkstra's format).
+    Visualizes a given path (assumes dijkstra's format). Returns the route
+    image as a base64 PNG string, served from the render cache when the same
+    path was drawn before with the same datasets and render settings.
 """
 
 
 def visualize_path(path):
     # data & graph setup #
-    # loading
-    data, names, positions, station_lookup = load_data()
-    metro = load_graph(data, positions)
-
-    # adjust graph #
-    metro, pos, labels, colors, node_label_dict, label_pos = jesus_take_the_wheel(
-        metro, path, names, positions, station_lookup
+    # loading (cached across requests)
+    context = data_context.get_context()
+    key = (
+        tuple(path),
+        NODE_SIZE,
+        FONT_SIZE,
+        DPI,
+        tuple(sorted(context.mtimes.items())),
     )
+    route_string_64 = _render_cache.get(key)
+    if route_string_64 is not None:
+        return route_string_64
+
+    png = _load_cached_png(key)
+    if png is None:
+        png = render_path_png(path, context)
+        _store_cached_png(key, png)
+    route_string_64 = base64.b64encode(png).decode("utf-8")
+    _render_cache.put(key, route_string_64)
+    return route_string_64
 
 
-    # save image to load #
-    nx.draw_networkx(
-        metro,
-        pos=pos,
-        node_size=50,
-        node_color=colors[0],
-        edge_color=colors[1],
-        with_labels=False,
-        font_size=8,
-    )
-    nx.draw_networkx_labels(metro, label_pos, node_label_dict, font_size=8)
+"""
+    Returns the rasterized grey map for the current datasets (every node and
+    edge in BASE_COLOR), rendering it on first use.
+"""
 
-    route_buffer = io.BytesIO()
-    plt.savefig(route_buffer, format="png", dpi=100)
-    plt.figure().clear()
-    route_buffer.seek(0)
-    route_string_64 = base64.b64encode(route_buffer.read()).decode("utf-8")
-    return route_string_64
+
+def get_base_layer(context):
+    global _base_layer, _base_layer_key
+    key = (tuple(sorted(context.mtimes.items())), NODE_SIZE, DPI)
+    with _base_layer_lock:
+        if _base_layer_key != key:
+            metro = context.map_graph
+            pos = context.map_pos
+
+            def draw(fig, ax):
+                nx.draw_networkx(
+                    metro,
+                    pos=pos,
+                    ax=ax,
+                    node_size=NODE_SIZE,
+                    node_color=BASE_COLOR,
+                    edge_color=BASE_COLOR,
+                    with_labels=False,
+                )
+
+            _base_layer = render_base_layer(draw, dpi=DPI)
+            _base_layer_key = key
+        return _base_layer
 
 
 """
-    What am I even reading rn. Half of this is probably not needed, 
-    but I'm scared to touch it.
+    Draws only the highlighted path over the cached base map and returns
+    PNG bytes.
 """
 
 
-def jesus_take_the_wheel(graph, path, names, positions, station_lookup):
-    # replace
-    previous_station = None
-    for station in path:
-        # get associated stations
-        station_name = names[station]
-        if station_name == previous_station:
-            continue
+def render_path_png(path, context):
+    names = context.names
+    positions = context.positions
+    station_lookup = context.station_lookup
+    metro = context.map_graph
 
-        try:
-            intersecting_stations = station_lookup[station_name]
-        except KeyError:
-            continue
-        previous_station = station_name
+    # adjust graph #
+    metro, pos, labels, colors, node_label_dict, label_pos = jesus_take_the_wheel(
+        metro,
+        path,
+        names,
+        positions,
+        station_lookup,
+        node_index=context.map_node_index,
+        edge_index=context.map_edge_index,
+        pos=context.map_pos,
+    )
+
+    # only the colored nodes/edges differ from the base layer
+    node_colors, edge_colors = colors
+    route_nodes = list(node_colors)
+    route_node_colors = list(node_colors.values())
+    route_edges = list(edge_colors)
+    route_edge_colors = list(edge_colors.values())
+
+    def draw(fig, ax):
+        nx.draw_networkx_edges(
+            metro, pos=pos, ax=ax, edgelist=route_edges, edge_color=route_edge_colors
+        )
+        nx.draw_networkx_nodes(
+            metro,
+            pos=pos,
+            ax=ax,
+            nodelist=route_nodes,
+            node_size=NODE_SIZE,
+            node_color=route_node_colors,
+        )
+        nx.draw_networkx_labels(metro, label_pos, node_label_dict, font_size=FONT_SIZE, ax=ax)
+
+    return encode_png(render_overlay(get_base_layer(context), draw), dpi=DPI)
+
+
+def _cached_png_path(key):
+    digest = hashlib.sha256(repr(key).encode("utf-8")).hexdigest()
+    return os.path.join(RENDER_CACHE_DIR, digest + ".png")
+
+
+def _load_cached_png(key):
+    if not RENDER_CACHE_DIR:
+        return None
+    try:
+        with open(_cached_png_path(key), "rb") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _store_cached_png(key, png):
+    if not RENDER_CACHE_DIR:
+        return
+    path = _cached_png_path(key)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.makedirs(RENDER_CACHE_DIR, exist_ok=True)
+        with open(tmp_path, "wb") as f:
+            f.write(png)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+
+
+"""
+    Colors a path (plus every same-station node along it) for drawing.
+    Returns sparse colors, {node: color} and {edge: color} (edges in the
+    graph's own orientation), both in graph order; work is linear in path
+    length. `node_index`, `edge_index` and `pos` are the
+    per-graph lookups cached on the DataContext; they're built here when
+    omitted.
+"""
 
-    # get attributes #
-    nodes = graph.nodes(data=True)
-    edges = graph.edges(data=True)
-    color_map_nodes = [BASE_COLOR] * len(nodes)
-    color_map_edges = [BASE_COLOR] * len(edges)
 
-    # labels
-    names_path = {
-        key: value for key, value in names.items() if key in nodes and key in path
-    }
+def jesus_take_the_wheel(graph, path, names, positions, station_lookup,
+                         node_index=None, edge_index=None, pos=None):
+    if node_index is None or edge_index is None:
+        node_index, edge_index = data_context.build_indexes(graph)
+    if pos is None:
+        pos = nx.get_node_attributes(graph, "pos")
 
-    nodes_list = list(graph.nodes())
-    edges_list = list(graph.edges())
     # node colors for only path
+    node_colors = {}
     for node in path:
-        color_map_nodes[nodes_list.index(node)] = positions[node][2]
-        station_name = names_path[node]
+        if node not in node_index:
+            continue
+        color = positions[node][2]
+        node_colors[node] = color
         try:
-            intersecting_stations = station_lookup[station_name]
+            intersecting_stations = station_lookup[names[node]]
         except KeyError:
             continue
         for station in intersecting_stations:
-            color_map_nodes[nodes_list.index(station)] = positions[node][2]
+            if station in node_index:
+                node_colors[station] = color
 
     # edge colors for only path
+    edge_colors = {}
     for start, end in zip(path, path[1:]):
-        edge = (start, end)
-        station_name1 = names[edge[0]]
-        station_name2 = names[edge[1]]
-        try:
-            color_map_edges[edges_list.index(edge)] = color_map_nodes[
-                nodes_list.index(edge[0])
-            ]
-        except ValueError:
-            color_map_edges[edges_list.index((edge[1], edge[0]))] = color_map_nodes[
-                nodes_list.index(edge[0])
-            ]
+        color = node_colors.get(start, BASE_COLOR)
+        i = edge_index.get((start, end))
+        if i is not None:
+            edge_colors[edge_index.edges[i]] = color
         try:
-            intersecting_stations1 = station_lookup[station_name1]
-            intersecting_stations2 = station_lookup[station_name2]
+            intersecting_stations1 = station_lookup[names[start]]
+            intersecting_stations2 = station_lookup[names[end]]
         except KeyError:
             continue
         for station1 in intersecting_stations1:
             for station2 in intersecting_stations2:
-                inter_edge = (station1, station2)
-                if inter_edge in edges_list:
-                    color_map_edges[edges_list.index(inter_edge)] = color_map_nodes[
-                        nodes_list.index(edge[0])
-                    ]
-
-    for i in path:
-        station_name = names_path[i]
-        try:
-            intersecting_stations = station_lookup[station_name]
-        except KeyError:
-            continue
-
-    pos = nx.get_node_attributes(graph, "pos")
-    check = path[0][0]
+                i = edge_index.get((station1, station2))
+                if i is not None:
+                    edge_colors[edge_index.edges[i]] = color
 
-    hold = []
-    hold.append(path[0])
-    for i in range(len(path)):
-        if path[i][0] != check:
-            hold.append(path[i])
-            check = path[i][0]
-    if path[len(path) - 1] not in hold:
-        hold.append(path[len(path) - 1])
+    # keep the graph's draw order
+    node_colors = dict(sorted(node_colors.items(), key=lambda item: node_index[item[0]]))
+    edge_colors = dict(sorted(edge_colors.items(), key=lambda item: edge_index[item[0]]))
 
-    node_label_dict = {}
-    for i in hold:
-        node_label_dict[i] = names[i]
-    label_pos = {node: (x, y - 50) for node, (x, y) in pos.items() if node in node_label_dict}
-
-    return graph, pos, node_label_dict, [color_map_nodes, color_map_edges], node_label_dict, label_pos
-
-
-"""
-    Initializes graph.
-"""
-
-
-def load_graph(data, positions):
-    # define graph
-    graph = nx.Graph()
-
-    # load with positions
-    for node, neighbors in data.items():
-        graph.add_node(node, pos=(positions[node][0], positions[node][1]))
-        for neighbor, weight in neighbors.items():
-            graph.add_edge(node, neighbor, weight=weight)
-    return graph
-
-
-"""
-    Loads data necessary for visualizing.
-"""
+    # labels at the start, every line change and the end
+    check = path[0][0]
+    hold = [path[0]]
+    for node in path:
+        if node[0] != check:
+            hold.append(node)
+            check = node[0]
+    if path[-1] not in hold:
+        hold.append(path[-1])
 
+    node_label_dict = {node: names[node] for node in hold}
+    label_pos = {node: (pos[node][0], pos[node][1] - 50) for node in node_label_dict if node in pos}
 
-def load_data():
-    # load datasets
-    with open("../datasets/clean_stations.json") as f:
-        data = json.load(f)
-    with open("../datasets/secondary.json", "r") as f:
-        names = json.load(f)
-    with open("../datasets/station_positions.json", "r") as f:
-        positions = json.load(f)
-    with open("../datasets/full_intersections.json", "r") as f:
-        station_lookup = json.load(f)
-
-    # adjust data
-    station_lookup = {k: list(v.keys()) for k, v in station_lookup.items()}
-    for i in positions:
-        positions[i][1] = 1785 - positions[i][1]
-
-    # return
-    return data, names, positions, station_lookup
+    return graph, pos, node_label_dict, [node_colors, edge_colors], node_label_dict, label_pos
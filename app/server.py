@@ -1,14 +1,14 @@
 # ----------------- imports ----------------- #
 import algorithm
+import data_context
 import map_visualizer
-import networkx as nx  # graph
 
 # ----------------- routes ----------------- #
 
 
 def get_path(source, destination):
-    # load graph #
-    metro_graph = nx.read_graphml("../datasets/tokyometro.graphml")
+    # load graph (cached across requests) #
+    metro_graph = data_context.get_context().hierarchy
 
     # find path #
     distance, path, path_string = algorithm.path_find(metro_graph, source, destination)
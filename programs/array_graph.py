@@ -0,0 +1,192 @@
+"""Array-backed graph used by tube_challenge's trial loop.
+
+`ArrayGraph` is built once from the networkx metro graph (graphml plus
+custom connections). Nodes get integer ids; edges live in flat NumPy arrays
+(endpoints, weight, line id) with CSR adjacency (`offsets`, `targets`,
+`edge_ids`) over them, so per-edge data is an index instead of a nested
+dict and a whole set of edge weights is one float array.
+
+It also implements the read-only slice of the networkx API that the timing
+and local-search code uses (`nodes`, `has_node`, `has_edge`,
+`get_edge_data`, `neighbors`, `edges`, ...), so those functions accept
+either kind of graph unchanged.
+
+`intern_timetables()` resolves, once, each node to an integer station id
+and each line to an integer timetable id, so code timing legs can look up
+a leg's station names and timetable by index instead of normalizing names
+and matching filenames per leg.
+"""
+import numpy as np
+
+
+def edge_weight(data):
+    """Edge weight in minutes: 'weight', else 'real_distance', else 3.0."""
+    w = data.get("weight") if data.get("weight") is not None else data.get("real_distance")
+    try:
+        return float(w) if w is not None else 3.0
+    except Exception:
+        return 3.0
+
+
+class ArrayGraph:
+    """Immutable graph with integer node ids and array-backed edges.
+
+    - `node_ids`: node codes in id order; `index`: node code -> id
+    - `edge_u`, `edge_v`: int32 endpoint ids per edge, in the source
+      graph's edge order
+    - `weights`: float64 weight per edge (see `edge_weight`)
+    - `line_ids`: int32 index into `lines` (the edges' "color" values)
+    - `offsets`, `targets`, `edge_ids`: CSR adjacency; the neighbors of
+      node i are `targets[offsets[i]:offsets[i + 1]]`, reached through
+      edges `edge_ids[...]` (both directions for an undirected graph)
+    """
+
+    def __init__(self, graph):
+        self.node_ids = list(graph.nodes())
+        self.index = {node: i for i, node in enumerate(self.node_ids)}
+        self.directed = graph.is_directed()
+
+        index = self.index
+        edges = list(graph.edges(data=True))
+        self.edge_u = np.array([index[u] for u, _v, _d in edges], dtype=np.int32)
+        self.edge_v = np.array([index[v] for _u, v, _d in edges], dtype=np.int32)
+        self.weights = np.array([edge_weight(d) for _u, _v, d in edges], dtype=np.float64)
+        self.lines = []
+        line_index = {}
+        line_ids = []
+        for _u, _v, d in edges:
+            line = d.get("color")
+            if line not in line_index:
+                line_index[line] = len(self.lines)
+                self.lines.append(line)
+            line_ids.append(line_index[line])
+        self.line_ids = np.array(line_ids, dtype=np.int32)
+        # attribute dicts are copied so later edits to `graph` don't leak in;
+        # treat them as read-only
+        self._data = [dict(d) for _u, _v, d in edges]
+
+        # filled in by intern_timetables()
+        self.stations = None
+        self.node_station = None
+        self.tables = None
+        self.line_table = None
+
+        # CSR adjacency
+        src, dst, ids = self.edge_u, self.edge_v, np.arange(len(edges), dtype=np.int32)
+        if not self.directed:
+            src, dst, ids = (
+                np.concatenate([self.edge_u, self.edge_v]),
+                np.concatenate([self.edge_v, self.edge_u]),
+                np.concatenate([ids, ids]),
+            )
+        order = np.argsort(src, kind="stable")
+        self.targets = dst[order]
+        self.edge_ids = ids[order]
+        self.offsets = np.zeros(len(self.node_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=len(self.node_ids)), out=self.offsets[1:])
+
+        # (u, v) node codes -> edge id, for the networkx-style lookups
+        self._edge_of = {}
+        for e, (u, v, _d) in enumerate(edges):
+            self._edge_of[(u, v)] = e
+            if not self.directed:
+                self._edge_of[(v, u)] = e
+
+    # ---- networkx-compatible reads ---- #
+    def nodes(self):
+        return self.index.keys()
+
+    def has_node(self, node):
+        return node in self.index
+
+    def __contains__(self, node):
+        return node in self.index
+
+    def __iter__(self):
+        return iter(self.node_ids)
+
+    def __len__(self):
+        return len(self.node_ids)
+
+    def number_of_nodes(self):
+        return len(self.node_ids)
+
+    def number_of_edges(self):
+        return len(self._data)
+
+    def is_directed(self):
+        return self.directed
+
+    def has_edge(self, u, v):
+        return (u, v) in self._edge_of
+
+    def get_edge_data(self, u, v, default=None):
+        e = self._edge_of.get((u, v))
+        if e is None:
+            return default
+        return self._data[e]
+
+    def neighbors(self, node):
+        i = self.index[node]
+        ids = self.node_ids
+        return iter([ids[j] for j in self.targets[self.offsets[i]:self.offsets[i + 1]].tolist()])
+
+    def edges(self, data=False):
+        ids = self.node_ids
+        pairs = zip(self.edge_u.tolist(), self.edge_v.tolist())
+        if not data:
+            return [(ids[u], ids[v]) for u, v in pairs]
+        return [(ids[u], ids[v], d) for (u, v), d in zip(pairs, self._data)]
+
+    # ---- array access ---- #
+    def edge_attrs(self, e):
+        """Attribute dict of edge `e` (as `get_edge_data` would return it)."""
+        return self._data[e]
+
+    def intern_timetables(self, station_of, table_of):
+        """Resolve nodes and lines to integer ids for timetable lookups.
+
+        - `station_of`: {node: station key} (e.g. a normalized name)
+        - `table_of`: callable mapping a line (an edge "color") to its
+          timetable key, or None if the line has none
+
+        Sets `stations` (distinct station keys), `node_station` (station id
+        per node id), `tables` (distinct timetable keys) and `line_table`
+        (table id per entry of `lines`, -1 for none); all are plain lists
+        for fast scalar indexing. Returns self.
+        """
+        self.stations = []
+        station_index = {}
+        self.node_station = []
+        for node in self.node_ids:
+            key = station_of.get(node)
+            if key not in station_index:
+                station_index[key] = len(self.stations)
+                self.stations.append(key)
+            self.node_station.append(station_index[key])
+        self.tables = []
+        table_index = {}
+        self.line_table = []
+        for line in self.lines:
+            key = table_of(line)
+            if key is None:
+                self.line_table.append(-1)
+                continue
+            if key not in table_index:
+                table_index[key] = len(self.tables)
+                self.tables.append(key)
+            self.line_table.append(table_index[key])
+        # per-edge line ids as a list, for the same reason
+        self._edge_line = self.line_ids.tolist()
+        return self
+
+    def leg_ids(self, u, v):
+        """Return (edge id, table id, from station id, to station id) for edge u -> v.
+
+        Requires `intern_timetables()`; the edge id is None (and the table
+        id -1) when u and v aren't adjacent.
+        """
+        e = self._edge_of.get((u, v))
+        table = -1 if e is None else self.line_table[self._edge_line[e]]
+        index = self.index
+        return e, table, self.node_station[index[u]], self.node_station[index[v]]
@@ -0,0 +1,293 @@
+"""Contraction hierarchy for static shortest-path queries.
+
+Nodes are contracted one at a time, least important first (by edge
+difference: shortcuts added minus edges removed). Contracting a node adds
+a shortcut u -> x for every pair of its remaining neighbors whose shortest
+connection runs through it, unless a bounded witness search finds another
+path that's no longer. Every edge then leads either "up" (to a node
+contracted later) or "down", and a shortest path always climbs and then
+descends, so a query is a bidirectional Dijkstra that only follows upward
+edges from both ends and settles a few dozen nodes even on large graphs.
+Shortcuts remember the node they skip and are unpacked into original edges.
+
+The hierarchy depends only on the graph's edges and weights; it's saved as
+`.npz` next to the graphml (`load_or_build`) with a hash of the edges and
+rebuilt whenever they change.
+"""
+import hashlib
+import heapq
+import os
+
+import numpy as np
+
+# Bump when the on-disk layout written by `save()` changes.
+CH_VERSION = 1
+
+# Witness searches give up after settling this many nodes (adding a
+# redundant shortcut is harmless, it just makes queries a little slower).
+WITNESS_SETTLE_LIMIT = 64
+
+
+def graph_key(graph, weight="weight"):
+    """Hash of a graph's directed edges and weights (what a hierarchy depends on)."""
+    h = hashlib.sha256()
+    h.update(repr((CH_VERSION, weight, graph.is_directed())).encode())
+    edges = sorted(
+        (str(u), str(v), float(data.get(weight, 1))) for u, v, data in graph.edges(data=True)
+    )
+    h.update(repr(edges).encode())
+    return h.hexdigest()[:16]
+
+
+class ContractionHierarchy:
+    """Contracted graph answering point-to-point shortest-path queries.
+
+    - `nodes`: node ids in index order; `index`: node id -> index
+    - `rank`: contraction order of each node (higher = more important)
+    - `up[i]`: [(j, w)] for edges i -> j with rank[j] > rank[i]
+    - `down[i]`: [(j, w)] for edges j -> i with rank[j] > rank[i]
+    - `middle`: {(i, j): k} for shortcuts i -> j replacing i -> k -> j
+    - `key`: `graph_key()` of the graph it was built from
+    """
+
+    def __init__(self, nodes, rank, src, dst, weight, mid, key=None):
+        self.nodes = list(nodes)
+        self.index = {node: i for i, node in enumerate(self.nodes)}
+        self.rank = [int(r) for r in rank]
+        self.key = key
+        self.up = [[] for _ in self.nodes]
+        self.down = [[] for _ in self.nodes]
+        self.middle = {}
+        self._edges = (src, dst, weight, mid)
+        for i, j, w, k in zip(src, dst, weight, mid):
+            i, j, w, k = int(i), int(j), float(w), int(k)
+            if self.rank[j] > self.rank[i]:
+                self.up[i].append((j, w))
+            else:
+                self.down[j].append((i, w))
+            if k >= 0:
+                self.middle[(i, j)] = k
+
+    @classmethod
+    def build(cls, graph, weight="weight"):
+        """Contract a networkx graph; missing weights count as 1 like networkx."""
+        nodes = list(graph.nodes())
+        index = {node: i for i, node in enumerate(nodes)}
+        n = len(nodes)
+        out = [{} for _ in range(n)]
+        inn = [{} for _ in range(n)]
+        mid = {}
+
+        def connect(u, x, w, via=-1):
+            if u != x and w < out[u].get(x, float("inf")):
+                out[u][x] = w
+                inn[x][u] = w
+                if via >= 0:
+                    mid[(u, x)] = via
+                else:
+                    mid.pop((u, x), None)
+
+        undirected = not graph.is_directed()
+        for u, v, data in graph.edges(data=True):
+            w = float(data.get(weight, 1))
+            connect(index[u], index[v], w)
+            if undirected:
+                connect(index[v], index[u], w)
+
+        def witnesses(u, skip, limit):
+            """Distances from u without passing through `skip`, up to `limit`."""
+            dist = {u: 0.0}
+            pq = [(0.0, u)]
+            settled = 0
+            while pq and settled < WITNESS_SETTLE_LIMIT:
+                d, a = heapq.heappop(pq)
+                if d > dist[a]:
+                    continue
+                if d > limit:
+                    break
+                settled += 1
+                for b, w in out[a].items():
+                    if b != skip and d + w < dist.get(b, float("inf")):
+                        dist[b] = d + w
+                        heapq.heappush(pq, (d + w, b))
+            return dist
+
+        def shortcuts(v):
+            """Shortcuts (u, x, w) needed to contract v."""
+            needed = []
+            outgoing = out[v]
+            if not outgoing:
+                return needed
+            longest = max(outgoing.values())
+            for u, w_in in inn[v].items():
+                dist = witnesses(u, v, w_in + longest)
+                for x, w_out in outgoing.items():
+                    if x != u and dist.get(x, float("inf")) > w_in + w_out:
+                        needed.append((u, x, w_in + w_out))
+            return needed
+
+        contracted_neighbors = [0] * n
+
+        def priority(v):
+            removed = len(out[v]) + len(inn[v])
+            return len(shortcuts(v)) - removed + contracted_neighbors[v]
+
+        pq = [(priority(v), v) for v in range(n)]
+        heapq.heapify(pq)
+        rank = [0] * n
+        src, dst, wts, mids = [], [], [], []
+        done = [False] * n
+        order = 0
+        while pq:
+            p, v = heapq.heappop(pq)
+            if done[v]:
+                continue
+            # lazy update: re-queue if v got more expensive than the next node
+            p = priority(v)
+            if pq and p > pq[0][0]:
+                heapq.heappush(pq, (p, v))
+                continue
+            for u, x, w in shortcuts(v):
+                connect(u, x, w, via=v)
+            # v's remaining edges are final: up edges of v, or down edges into v
+            for x, w in out[v].items():
+                src.append(v); dst.append(x); wts.append(w); mids.append(mid.get((v, x), -1))
+                del inn[x][v]
+                contracted_neighbors[x] += 1
+            for u, w in inn[v].items():
+                src.append(u); dst.append(v); wts.append(w); mids.append(mid.get((u, v), -1))
+                del out[u][v]
+                contracted_neighbors[u] += 1
+            out[v] = {}
+            inn[v] = {}
+            done[v] = True
+            rank[v] = order
+            order += 1
+
+        return cls(nodes, rank, src, dst, wts, mids, key=graph_key(graph, weight))
+
+    def save(self, path):
+        """Write the hierarchy as `.npz` (atomically, via a temp file)."""
+        src, dst, weight, mid = self._edges
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(
+                f,
+                version=np.array(CH_VERSION),
+                key=np.array(self.key or ""),
+                nodes=np.array([str(node) for node in self.nodes]),
+                rank=np.asarray(self.rank, dtype=np.int32),
+                src=np.asarray(src, dtype=np.int32),
+                dst=np.asarray(dst, dtype=np.int32),
+                weight=np.asarray(weight, dtype=np.float64),
+                mid=np.asarray(mid, dtype=np.int32),
+            )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        """Read a hierarchy written by `save()`; returns None if missing or stale."""
+        try:
+            with np.load(path) as data:
+                if int(data["version"]) != CH_VERSION:
+                    return None
+                return cls(
+                    data["nodes"].tolist(), data["rank"], data["src"], data["dst"],
+                    data["weight"], data["mid"], key=str(data["key"]),
+                )
+        except (OSError, KeyError, ValueError):
+            return None
+
+    @classmethod
+    def load_or_build(cls, graph, path, weight="weight"):
+        """Load the hierarchy saved at `path` if it matches `graph`, else build and save it.
+
+        Node ids are stored as strings, as read from graphml. Failing to
+        write the file is ignored (the hierarchy is only a cache).
+        """
+        key = graph_key(graph, weight)
+        hierarchy = cls.load(path)
+        if hierarchy is not None and hierarchy.key == key:
+            return hierarchy
+        hierarchy = cls.build(graph, weight=weight)
+        try:
+            hierarchy.save(path)
+        except OSError:
+            pass
+        return hierarchy
+
+    def query(self, start, end):
+        """Shortest path from `start` to `end`.
+
+        Same contract as `dijkstras.dijkstra`: returns (distance, path) and
+        raises ValueError for unknown nodes or when `end` is unreachable.
+        """
+        try:
+            s = self.index[start]
+            t = self.index[end]
+        except KeyError as e:
+            raise ValueError(f"Unknown station node: {e.args[0]}") from None
+        if s == t:
+            return 0, [start]
+
+        inf = float("inf")
+        dist = ({s: 0.0}, {t: 0.0})
+        parent = ({s: -1}, {t: -1})
+        queues = ([(0.0, s)], [(0.0, t)])
+        edges = (self.up, self.down)
+        best = inf
+        meet = -1
+        while queues[0] or queues[1]:
+            # expand the side with the smaller tentative distance
+            side = 0 if queues[0] and (not queues[1] or queues[0][0][0] <= queues[1][0][0]) else 1
+            pq = queues[side]
+            d, u = heapq.heappop(pq)
+            if d >= best:
+                pq.clear()
+                continue
+            own = dist[side]
+            if d > own[u]:
+                continue
+            other = dist[1 - side].get(u)
+            if other is not None and d + other < best:
+                best = d + other
+                meet = u
+            for x, w in edges[side][u]:
+                if d + w < own.get(x, inf):
+                    own[x] = d + w
+                    parent[side][x] = u
+                    heapq.heappush(pq, (d + w, x))
+
+        if meet < 0:
+            raise ValueError(f"No path from {start} to {end}")
+
+        # s .. meet from the forward tree, meet .. t from the backward tree
+        path = [meet]
+        while parent[0][path[-1]] >= 0:
+            path.append(parent[0][path[-1]])
+        path.reverse()
+        while parent[1][path[-1]] >= 0:
+            path.append(parent[1][path[-1]])
+        return best, [self.nodes[i] for i in self._unpack(path)]
+
+    def distance(self, start, end):
+        """Shortest-path weight from `start` to `end` (inf if unreachable)."""
+        try:
+            return self.query(start, end)[0]
+        except ValueError:
+            return float("inf")
+
+    def _unpack(self, path):
+        """Replace shortcuts in an index path by the original edges."""
+        middle = self.middle
+        unpacked = [path[0]]
+        stack = [(a, b) for a, b in zip(path[-2::-1], path[:0:-1])]
+        while stack:
+            a, b = stack.pop()
+            k = middle.get((a, b))
+            if k is None:
+                unpacked.append(b)
+            else:
+                stack.append((k, b))
+                stack.append((a, k))
+        return unpacked
@@ -1,64 +1,84 @@
-import json
-
-import networkx as nx
-
-graph = nx.read_graphml("datasets/tokyometro.graphml")
-# start = sys.argv[1]
-# end = sys.argv[2]
-
-# implement all translation maps
-FILE_PATH = "datasets/secondary.json"
-with open(FILE_PATH, "r") as file:
-    secondary = json.load(file)
-tertiary = dict((v, k) for k, v in secondary.items())
-letter_to_line = {
-    "A": "Asakusa",
-    "I": "Mita",
-    "S": "Shinjuku",
-    "E": "Oedo",
-    "G": "Ginza",
-    "M": "Marunouchi",
-    "B": "Marunouchi Branch",
-    "H": "Hibiya",
-    "T": "Tozai",
-    "C": "Chiyoda",
-    "Y": "Yurakucho",
-    "Z": "Hanzomon",
-    "N": "Namboku",
-    "F": "Fukutoshin",
-}
+"""
+Shared shortest-path engine: binary-heap Dijkstra over a compact
+adjacency representation.
 
+Used by point_to_point.py, testingnewgraph.py and app/algorithm.py. Build a
+CompactGraph once per loaded graph and pass it to `dijkstra` to skip the
+networkx conversion on every query.
+"""
 
-def dijkstra(graph, start, end):
-    distances = {node: 1e7 for node in graph.nodes()}
-    distances[start] = 0
-    pq = [(0, start)]  # priority queue of nodes to visit
-    visited = set()
-    previous = {}
+import heapq
 
-    while len(pq) > 0:
-        current_distance, current_node = pq.pop(0)
 
-        if current_node == end:
-            break
-        elif current_node not in visited:
-            visited.add(current_node)
+class CompactGraph:
+    """Integer-indexed adjacency lists built once from a networkx graph.
+
+    - `nodes`: node ids in index order
+    - `index`: node id -> index
+    - `neighbors[i]` / `weights[i]`: aligned neighbor indexes and edge weights
+    """
+
+    __slots__ = ("nodes", "index", "neighbors", "weights")
+
+    def __init__(self, graph, weight="weight"):
+        self.nodes = list(graph.nodes())
+        self.index = {node: i for i, node in enumerate(self.nodes)}
+        self.neighbors = []
+        self.weights = []
+        for node in self.nodes:
+            adj = graph.adj[node]
+            self.neighbors.append([self.index[n] for n in adj])
+            self.weights.append([data.get(weight, 1) for data in adj.values()])
+
 
-            for n in graph.neighbors(current_node):
-                weight = graph[current_node][n]["weight"]
-                distance_to_neightbor = current_distance + weight
+def as_compact(graph):
+    """Return `graph` as a CompactGraph, converting a networkx graph if needed."""
+    if isinstance(graph, CompactGraph):
+        return graph
+    return CompactGraph(graph)
 
-                if distance_to_neightbor < distances[n]:
-                    distances[n] = distance_to_neightbor
-                    previous[n] = current_node
-                    pq.append((distance_to_neightbor, n))
 
-    path = []
-    temp = end
-    while temp != start:
-        path.insert(0, temp)
-        temp = previous[temp]
+def dijkstra(graph, start, end):
+    """Shortest path from `start` to `end`.
+
+    `graph` is a CompactGraph or a networkx graph with "weight" edge
+    attributes. Uses a binary heap with lazy deletion (stale heap entries
+    are skipped on pop) and stops as soon as `end` is settled.
+
+    Returns (distance, path); raises ValueError if `end` is unreachable.
+    """
+    compact = as_compact(graph)
+    try:
+        source = compact.index[start]
+        target = compact.index[end]
+    except KeyError as e:
+        raise ValueError(f"Unknown station node: {e.args[0]}") from None
+
+    neighbors = compact.neighbors
+    weights = compact.weights
+    dist = [float("inf")] * len(compact.nodes)
+    previous = [-1] * len(compact.nodes)
+    dist[source] = 0
+    pq = [(0, source)]
+
+    while pq:
+        current_distance, current = heapq.heappop(pq)
+        if current_distance > dist[current]:
+            continue  # stale entry
+        if current == target:
+            break
+        for n, w in zip(neighbors[current], weights[current]):
+            candidate = current_distance + w
+            if candidate < dist[n]:
+                dist[n] = candidate
+                previous[n] = current
+                heapq.heappush(pq, (candidate, n))
 
-    path.insert(0, start)
+    if dist[target] == float("inf"):
+        raise ValueError(f"No path from {start} to {end}")
 
-    return distances[end], path
+    path = [target]
+    while path[-1] != source:
+        path.append(previous[path[-1]])
+    path.reverse()
+    return dist[target], [compact.nodes[i] for i in path]
@@ -0,0 +1,188 @@
+"""Degree-2 chain contraction for the tour's TSP instance.
+
+Most stations sit inside a run of a single line with no transfers: their
+node has exactly two neighbors, both on that line, so any tour covering
+them walks the run from one end to the other (or, for a branch ending in a
+terminal, into it and back out). `find_chains` collects each maximal run
+as a `Chain`, and the TSP only sees its end stations (`contract_nodes`):
+
+- a run between two junctions keeps its first and last node, tied
+  together in the distance matrix (`tie_chain_ends`) so the tour always
+  goes straight from one to the other
+- a branch keeps only the node it's entered by; the trip to the terminal
+  and back costs the same wherever the tour takes it
+
+`splice_chains` then puts the whole runs back into the TSP order.
+
+Lines that aren't simple runs (the Oedo figure-6) can still be handled the
+same way by building their Chain by hand and splicing it in at its anchor
+(`splice_at_anchor`).
+"""
+from array_graph import edge_weight
+
+# Matrix entry tying a chain's two ends together: low enough that every
+# tour constructor joins them before anything else.
+CHAIN_TIE = -1e6
+
+
+class Chain:
+    """A run of stations traversed as one unit.
+
+    - `nodes`: the run's nodes in walking order
+    - `ends`: (a, b), the nodes adjacent to nodes[0] and nodes[-1] outside
+      the run (None past a terminal)
+    - `line`: the line (edge "color") of the run
+    - `minutes`: total edge weight from nodes[0] to nodes[-1]
+    - `anchor`: node replaced by the whole run in `splice_at_anchor`
+      (hand-built chains); defaults to the middle node
+    """
+
+    __slots__ = ("nodes", "ends", "line", "minutes", "anchor")
+
+    def __init__(self, nodes, ends=(None, None), line=None, minutes=0.0, anchor=None):
+        self.nodes = list(nodes)
+        self.ends = ends
+        self.line = line
+        self.minutes = minutes
+        self.anchor = anchor if anchor is not None else self.nodes[len(self.nodes) // 2]
+
+    def __len__(self):
+        return len(self.nodes)
+
+    @property
+    def dead_end(self):
+        """True if the run ends in a terminal (walked in and back out)."""
+        return self.ends[1] is None
+
+    def tsp_nodes(self):
+        """The nodes standing in for this chain in the TSP."""
+        if self.dead_end or len(self.nodes) == 1:
+            return self.nodes[:1]
+        return [self.nodes[0], self.nodes[-1]]
+
+
+def _line_of(graph, node):
+    """The single line of a degree-2 or degree-1 node's edges, else None."""
+    lines = {data.get("color") for _u, _v, data in graph.edges(node, data=True)}
+    return lines.pop() if len(lines) == 1 else None
+
+
+def find_chains(graph, skip=(), min_length=2):
+    """Return the maximal same-line chains of `graph` as Chains.
+
+    A chain is a run of degree-2 nodes whose two edges are on the same
+    line, extended by the terminal (a degree-1 node) if it runs into one.
+    Nodes in `skip` are never part of a chain. Chains shorter than
+    `min_length` nodes gain nothing from contraction and are left out.
+    """
+    skip = set(skip)
+    interior = {
+        n for n in graph.nodes()
+        if n not in skip and graph.degree(n) == 2 and _line_of(graph, n) is not None
+    }
+    seen = set()
+    chains = []
+    # walk from nodes in graph order (not set order) so the chains, and the
+    # direction each is listed in, don't depend on string hashing
+    for start in graph.nodes():
+        if start not in interior or start in seen:
+            continue
+        line = _line_of(graph, start)
+        # walk outwards both ways from `start`
+        halves = []
+        for first in graph.neighbors(start):
+            half = []
+            prev, node = start, first
+            while node in interior and node not in seen and node != start and _line_of(graph, node) == line:
+                half.append(node)
+                seen.add(node)
+                prev, node = node, next(n for n in graph.neighbors(node) if n != prev)
+            end = node
+            if (
+                end not in skip and end != start and graph.degree(end) == 1
+                and _line_of(graph, end) == line
+            ):
+                # dead end: the terminal belongs to the run
+                half.append(end)
+                seen.add(end)
+                end = None
+            halves.append((half, end))
+        seen.add(start)
+        (left, a), (right, b) = halves if len(halves) == 2 else (halves[0], ([], None))
+        nodes = left[::-1] + [start] + right
+        if len(nodes) < min_length:
+            continue
+        if a is None and b is not None:
+            # keep a dead end at the far side: walk in from the junction
+            nodes.reverse()
+            a, b = b, a
+        minutes = sum(
+            edge_weight(graph.get_edge_data(u, v)) for u, v in zip(nodes, nodes[1:])
+        )
+        chains.append(Chain(nodes, ends=(a, b), line=line, minutes=minutes))
+    chains.sort(key=lambda c: str(c.nodes[0]))
+    return chains
+
+
+def contract_nodes(nodes, chains):
+    """Replace the members of every chain in `nodes` by its `tsp_nodes()`.
+
+    They take the place of the first member encountered; other nodes keep
+    their order.
+    """
+    member_of = {}
+    for chain in chains:
+        for node in chain.nodes:
+            member_of[node] = chain
+    contracted = []
+    placed = set()
+    for node in nodes:
+        chain = member_of.get(node)
+        if chain is None:
+            contracted.append(node)
+        elif id(chain) not in placed:
+            placed.add(id(chain))
+            contracted.extend(chain.tsp_nodes())
+    return contracted
+
+
+def tie_chain_ends(dist, nodes, chains):
+    """Set `dist` (indexed like `nodes`) to CHAIN_TIE between each chain's two ends."""
+    index = {node: k for k, node in enumerate(nodes)}
+    for chain in chains:
+        ends = chain.tsp_nodes()
+        if len(ends) == 2 and ends[0] in index and ends[1] in index:
+            i, j = index[ends[0]], index[ends[1]]
+            dist[i, j] = dist[j, i] = CHAIN_TIE
+
+
+def splice_chains(order, chains):
+    """Expand the chain ends in a TSP `order` into their full runs.
+
+    A run is walked starting from whichever of its ends comes first in
+    `order` (its other end is dropped when reached).
+    """
+    start_of = {}
+    for chain in chains:
+        ends = chain.tsp_nodes()
+        start_of[ends[0]] = chain.nodes
+        if len(ends) == 2:
+            start_of[ends[-1]] = chain.nodes[::-1]
+    spliced = []
+    done = set()
+    for node in order:
+        run = start_of.get(node)
+        if run is None:
+            spliced.append(node)
+        elif node not in done:
+            done.update((run[0], run[-1]))
+            spliced.extend(run)
+    return spliced
+
+
+def splice_at_anchor(route, chain):
+    """Replace the first occurrence of `chain.anchor` in `route` by its nodes."""
+    if chain.anchor not in route:
+        return route
+    k = route.index(chain.anchor)
+    return route[:k] + chain.nodes + route[k + 1:]
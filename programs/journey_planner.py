@@ -0,0 +1,452 @@
+"""Connection Scan earliest-arrival queries over the timetables.
+
+Every consecutive pair of stops of every trip in a set of `LineTimetable`s
+becomes one elementary connection (from_stop, to_stop, depart, arrive,
+trip). Connections are sorted by departure once; a query "leave stop A at
+minute T, arrive at B as early as possible" is then a single forward scan
+from the first connection departing at or after T that stops as soon as
+departures pass the best known arrival at B (the Connection Scan
+Algorithm). Stops are normalized station names, so lines sharing a
+station name meet at one stop; changing trains there costs
+`change_minutes`.
+
+Graph edges that no timetable covers (walking transfers, buses, lines
+without a timetable file) are added with `add_links()` as fixed duration
+links that can be taken at any time.
+
+Times are minutes since midnight of the service day; trips running past
+midnight keep counting up (e.g. 24:15 is 1455).
+"""
+import heapq
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+
+# Connections are scanned in chunks converted to Python lists, which is
+# much faster than indexing NumPy arrays element by element.
+SCAN_CHUNK = 4096
+
+
+class Leg:
+    """One leg of a journey.
+
+    - `from_stop`, `to_stop`: normalized station names
+    - `depart`, `arrive`: minutes since midnight
+    - `trip_id`, `line`: the trip ridden and its timetable name (without
+      `.json`), both None for a fixed link
+    """
+
+    __slots__ = ("from_stop", "to_stop", "depart", "arrive", "trip_id", "line")
+
+    def __init__(self, from_stop, to_stop, depart, arrive, trip_id=None, line=None):
+        self.from_stop = from_stop
+        self.to_stop = to_stop
+        self.depart = depart
+        self.arrive = arrive
+        self.trip_id = trip_id
+        self.line = line
+
+
+class ConnectionScan:
+    """Earliest-arrival journey planner built from `{filename: LineTimetable}`.
+
+    Pass timetables already narrowed to one service day
+    (`timetables_for_service_day`).
+    """
+
+    def __init__(self, timetables, change_minutes=2):
+        self.change_minutes = change_minutes
+        self.stops = []
+        self.index = {}
+        self.lines = []
+        self.trip_ids = []
+        self.trip_line = []
+        self.links = []
+        self.names = {}
+        self._hops = None
+
+        parts = []
+        for fname, line_tt in timetables.items():
+            if not len(line_tt):
+                continue
+            part = self._connections(line_tt, len(self.trip_ids))
+            self.lines.append(fname[:-5] if fname.endswith(".json") else fname)
+            self.trip_ids.extend(line_tt.trips["id"].tolist())
+            self.trip_line.extend([len(self.lines) - 1] * len(line_tt))
+            if part is not None:
+                parts.append(part)
+
+        if parts:
+            dep, arr, src, dst, trip, seq = (np.concatenate(cols) for cols in zip(*parts))
+        else:
+            dep = arr = src = dst = trip = seq = np.zeros(0, dtype=np.int32)
+        order = np.lexsort((seq, arr, dep))
+        self.dep = dep[order]
+        self.arr = arr[order]
+        self.src = src[order]
+        self.dst = dst[order]
+        self.trip = trip[order]
+        self._departures = self.dep.tolist()
+
+    def _stop(self, name):
+        stop = self.index.get(name)
+        if stop is None:
+            stop = self.index[name] = len(self.stops)
+            self.stops.append(name)
+            self.links.append([])
+        return stop
+
+    def _connections(self, line_tt, trip_offset):
+        """Return the (dep, arr, src, dst, trip, seq) arrays of one timetable."""
+        times = line_tt.trips["time"].astype(np.int32)
+        order = line_tt.trips["order"].astype(np.int32)
+        valid = (order >= 0) & (times >= 0)
+        # stops of each trip in calling order, absent stops at the end
+        perm = np.argsort(np.where(valid, order, np.iinfo(np.int32).max), axis=1, kind="stable")
+        valid = np.take_along_axis(valid, perm, axis=1)
+        times = np.take_along_axis(times, perm, axis=1)
+        stops = np.array([self._stop(name) for name in line_tt.stations], dtype=np.int32)[perm]
+
+        # a time earlier than the previous stop's means the trip crossed midnight
+        pair = valid[:, :-1] & valid[:, 1:]
+        rollover = np.cumsum(pair & (np.diff(times, axis=1) < 0), axis=1)
+        times[:, 1:] += rollover.astype(np.int32) * 1440
+
+        pair &= stops[:, :-1] != stops[:, 1:]
+        rows, cols = np.nonzero(pair)
+        if not len(rows):
+            return None
+        return (
+            times[rows, cols],
+            times[rows, cols + 1],
+            stops[rows, cols],
+            stops[rows, cols + 1],
+            (rows + trip_offset).astype(np.int32),
+            cols.astype(np.int32),
+        )
+
+    def __len__(self):
+        return len(self.dep)
+
+    def add_links(self, edges, station_of, names=None, weight="weight"):
+        """Add fixed links for graph edges the timetables don't cover.
+
+        `edges` yields (u, v, data) graph edges (e.g. walking transfers or
+        lines without a timetable) and `station_of` maps nodes to stop names
+        (normalized station names); edges within one stop are ignored. An
+        edge direction whose stop pair has no connection becomes a link
+        taking the edge's `weight` minutes. `names` optionally maps nodes to
+        display names (see `display()`).
+
+        Returns the number of links added.
+        """
+        served = set(zip(self.src.tolist(), self.dst.tolist()))
+        added = 0
+        for u, v, data in edges:
+            a = station_of.get(u)
+            b = station_of.get(v)
+            if not a or not b or a == b:
+                continue
+            a = self._stop(a)
+            b = self._stop(b)
+            try:
+                minutes = float(data.get(weight, 3.0))
+            except (TypeError, ValueError):
+                minutes = 3.0
+            for x, y in ((a, b), (b, a)):
+                if (x, y) not in served and not any(s == y for s, _m in self.links[x]):
+                    self.links[x].append((y, minutes))
+                    added += 1
+        self._hops = None
+        if names:
+            for node, name in names.items():
+                stop = station_of.get(node)
+                if stop:
+                    self.names.setdefault(stop, name)
+        return added
+
+    def _lower_bounds(self, origin, reverse=False):
+        """Minimum minutes from `origin` to every stop (to it if `reverse`),
+        ignoring waits and changes; inf where unreachable."""
+        if self._hops is None:
+            # fastest ride per stop pair, plus the links, in both directions
+            n = len(self.stops)
+            key = self.src.astype(np.int64) * n + self.dst
+            order = np.lexsort((self.arr - self.dep, key))
+            first = np.ones(len(order), dtype=bool)
+            first[1:] = key[order][1:] != key[order][:-1]
+            pick = order[first]
+            forward = [[] for _ in range(n)]
+            backward = [[] for _ in range(n)]
+            pairs = zip(self.src[pick].tolist(), self.dst[pick].tolist(), (self.arr - self.dep)[pick].tolist())
+            for a, b, minutes in pairs:
+                forward[a].append((b, minutes))
+                backward[b].append((a, minutes))
+            for a, links in enumerate(self.links):
+                for b, minutes in links:
+                    forward[a].append((b, minutes))
+                    backward[b].append((a, minutes))
+            self._hops = (forward, backward)
+
+        hops = self._hops[1 if reverse else 0]
+        dist = [float("inf")] * len(self.stops)
+        dist[origin] = 0
+        pq = [(0, origin)]
+        while pq:
+            d, u = heapq.heappop(pq)
+            if d > dist[u]:
+                continue
+            for w, minutes in hops[u]:
+                if d + minutes < dist[w]:
+                    dist[w] = d + minutes
+                    heapq.heappush(pq, (d + minutes, w))
+        return np.array(dist)
+
+    def display(self, stop):
+        """Display name of a stop, falling back to the stop name itself."""
+        return self.names.get(stop, stop)
+
+    def earliest_arrival(self, source, target, depart_min):
+        """Plan the earliest-arriving journey from `source` to `target`.
+
+        `source` and `target` are stop names; `depart_min` is the earliest
+        departure in minutes since midnight (may be fractional).
+
+        Returns the journey's list of Legs (empty if source == target), or
+        None if `target` can't be reached on this service day.
+        """
+        try:
+            s = self.index[source]
+            t = self.index[target]
+        except KeyError as e:
+            raise ValueError(f"Unknown stop: {e.args[0]}") from None
+        if s == t:
+            return []
+
+        inf = float("inf")
+        change = self.change_minutes
+        links = self.links
+        arrival = [inf] * len(self.stops)
+        # earliest time a new trip can be boarded at each stop and how it was
+        # reached: ("trip", board connection, alight connection) or
+        # ("walk", from stop, to stop, depart, arrive, how from stop was left)
+        ready = [inf] * len(self.stops)
+        via = [None] * len(self.stops)
+        best = inf
+        best_via = None
+        boarded = {}
+
+        arrival[s] = ready[s] = depart_min
+        for w, minutes in links[s]:
+            step = ("walk", s, w, depart_min, depart_min + minutes, None)
+            if w == t:
+                if depart_min + minutes < best:
+                    best, best_via = depart_min + minutes, step
+            elif depart_min + minutes < ready[w]:
+                ready[w] = depart_min + minutes
+                via[w] = step
+
+        start = bisect_left(self._departures, depart_min)
+        done = False
+        for lo in range(start, len(self._departures), SCAN_CHUNK):
+            hi = lo + SCAN_CHUNK
+            chunk = zip(
+                range(lo, hi),
+                self._departures[lo:hi],
+                self.arr[lo:hi].tolist(),
+                self.src[lo:hi].tolist(),
+                self.dst[lo:hi].tolist(),
+                self.trip[lo:hi].tolist(),
+            )
+            for c, dep, arr, src, dst, trip in chunk:
+                if dep >= best:
+                    done = True
+                    break
+                board = boarded.get(trip)
+                if board is None:
+                    if ready[src] > dep:
+                        continue
+                    board = boarded[trip] = c
+                if arr >= arrival[dst]:
+                    continue
+                arrival[dst] = arr
+                ride = ("trip", board, c)
+                if dst == t:
+                    # a walk into t may already have beaten this train
+                    if arr < best:
+                        best, best_via = arr, ride
+                    continue
+                if arr + change < ready[dst]:
+                    ready[dst] = arr + change
+                    via[dst] = ride
+                for w, minutes in links[dst]:
+                    step = ("walk", dst, w, arr, arr + minutes, ride)
+                    if w == t:
+                        if arr + minutes < best:
+                            best, best_via = arr + minutes, step
+                    elif arr + minutes < ready[w]:
+                        ready[w] = arr + minutes
+                        via[w] = step
+            if done:
+                break
+
+        if best == inf:
+            return None
+        return self._journey(s, best_via, via)
+
+    def profile(self, source, target, from_min, to_min, max_trips=5, max_minutes=240):
+        """All Pareto-optimal journeys from `source` to `target` leaving in a window.
+
+        A journey is (depart, arrive, transfers): leaving `source` at minute
+        `depart` (between `from_min` and `to_min`) it reaches `target` at
+        `arrive` with `transfers` changes of train. It's kept unless another
+        one departs no earlier, arrives no later and changes no more often.
+        Journeys use at most `max_trips` trains, and only connections
+        departing by `to_min + max_minutes` are scanned, so journeys slower
+        than `max_minutes` may be missed.
+
+        Runs one backward scan over the connections (profile CSA with a
+        transfer bound): every stop keeps a profile of (departure, arrival
+        per number of trips) entries, and every trip the arrivals reachable
+        by staying on board. Connections that can't be reached from
+        `source` after `from_min`, or can't reach `target` within the
+        horizon even on the fastest rides, are dropped before the scan.
+        Plan a chosen departure's legs with `earliest_arrival()`.
+
+        Returns the journeys sorted by departure, then transfers.
+        """
+        try:
+            s = self.index[source]
+            t = self.index[target]
+        except KeyError as e:
+            raise ValueError(f"Unknown stop: {e.args[0]}") from None
+        if s == t:
+            return []
+
+        inf = float("inf")
+        never = (inf,) * max_trips
+        change = self.change_minutes
+        links = self.links
+        # per stop: negated departures (ascending) and their arrival vectors;
+        # vec[k] is the earliest arrival at t boarding here with <= k + 1 trips,
+        # already combined with every later entry
+        prof_dep = [[] for _ in self.stops]
+        prof_vec = [[] for _ in self.stops]
+        trip_vec = {}
+        # stops linked to the source, to leave it on foot
+        into_source = [(w, minutes) for w, minutes in links[s]]
+        # walks out of the source leave before the connection they reach, so
+        # they wait here (by latest departure) until the scan passes them
+        # and the source's entries stay sorted
+        walks_out = []
+
+        def record(stop, dep, vec):
+            if stop == s:
+                while walks_out and -walks_out[0][0] > dep:
+                    walk_dep, walk_vec = heapq.heappop(walks_out)
+                    record_at(s, -walk_dep, walk_vec)
+            record_at(stop, dep, vec)
+
+        def record_at(stop, dep, vec):
+            deps = prof_dep[stop]
+            vecs = prof_vec[stop]
+            # at the source, departures in the window don't inherit (or get
+            # shadowed by) the ones after it
+            if vecs and not (stop == s and dep <= to_min < -deps[-1]):
+                vec = tuple(map(min, vec, vecs[-1]))
+                if vec == vecs[-1]:
+                    return
+                if deps[-1] == -dep:
+                    vecs[-1] = vec
+                    return
+            deps.append(-dep)
+            vecs.append(vec)
+
+        horizon = to_min + max_minutes
+        start = bisect_left(self._departures, from_min)
+        stop = bisect_right(self._departures, horizon)
+        dep_all = self.dep[start:stop]
+        arr_all = self.arr[start:stop]
+        src_all = self.src[start:stop]
+        dst_all = self.dst[start:stop]
+        keep = (
+            (dep_all - self._lower_bounds(s)[src_all] >= from_min)
+            & (arr_all + self._lower_bounds(t, reverse=True)[dst_all] <= horizon)
+        )
+        keep = np.flatnonzero(keep)[::-1]
+        for lo in range(0, len(keep), SCAN_CHUNK):
+            rows = keep[lo:lo + SCAN_CHUNK]
+            chunk = zip(
+                dep_all[rows].tolist(),
+                arr_all[rows].tolist(),
+                src_all[rows].tolist(),
+                dst_all[rows].tolist(),
+                self.trip[start:stop][rows].tolist(),
+            )
+            for dep, arr, src, dst, trip in chunk:
+                if dst == t:
+                    best = (arr,) * max_trips
+                else:
+                    best = trip_vec.get(trip, never)
+                    # change trains at dst, or walk a link and board there
+                    i = bisect_right(prof_dep[dst], -(arr + change)) - 1
+                    after = prof_vec[dst][i] if i >= 0 else never
+                    for w, minutes in links[dst]:
+                        if w == t:
+                            reach = (arr + minutes,) * max_trips
+                        else:
+                            i = bisect_right(prof_dep[w], -(arr + minutes)) - 1
+                            if i < 0:
+                                continue
+                            reach = prof_vec[w][i]
+                        after = tuple(map(min, after, reach))
+                    if after[-1] != inf:
+                        after = (inf,) + after[:-1]
+                        best = after if best is never else tuple(map(min, best, after))
+                    elif best is never:
+                        continue
+                trip_vec[trip] = best
+                record(src, dep, best)
+                if src != s:
+                    for w, minutes in into_source:
+                        if w == src:
+                            heapq.heappush(walks_out, (minutes - dep, best))
+
+        while walks_out:
+            walk_dep, walk_vec = heapq.heappop(walks_out)
+            record_at(s, -walk_dep, walk_vec)
+
+        journeys = []
+        # entries after the window aren't folded into the ones before it
+        # (see record_at) and mustn't dominate them either
+        later = never
+        for neg_dep, vec in zip(prof_dep[s], prof_vec[s]):
+            dep = -neg_dep
+            if dep > to_min:
+                continue
+            if dep >= from_min:
+                for k, arr in enumerate(vec):
+                    if arr < later[k] and (k == 0 or arr < vec[k - 1]):
+                        journeys.append((dep, arr, k))
+            later = vec
+        journeys.sort()
+        return journeys
+
+    def _journey(self, s, step, via):
+        legs = []
+        while step is not None:
+            if step[0] == "walk":
+                _kind, prev, stop, depart, arrive, step = step
+                legs.append(Leg(self.stops[prev], self.stops[stop], depart, arrive))
+                continue
+            _kind, board, alight = step
+            prev = int(self.src[board])
+            trip = int(self.trip[board])
+            legs.append(Leg(
+                self.stops[prev], self.stops[int(self.dst[alight])],
+                int(self.dep[board]), int(self.arr[alight]),
+                self.trip_ids[trip], self.lines[self.trip_line[trip]],
+            ))
+            step = via[prev] if prev != s else None
+        legs.reverse()
+        return legs
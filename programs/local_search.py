@@ -0,0 +1,257 @@
+"""Move-based local search over an open route.
+
+A route is a list of nodes whose first and last entries stay fixed. Each
+move rewrites one contiguous window of it and keeps its length, so the
+caller can re-time only that window (tube_challenge.retime_route):
+
+- `two_opt`: reverse route[i+1:j+1]
+- `or_opt`: move a block of 1-3 nodes elsewhere, optionally reversed
+- `segment_swap`: exchange adjacent segments route[i+1:j+1] and
+  route[j+1:k+1] (the pure-reconnection 3-opt move)
+
+Moves are generated from neighbor lists (the k nearest route nodes of each
+node by shortest-path distance) and screened by their O(1) change in
+static distance; only statically improving moves are handed to the
+caller's `evaluate` for the expensive timed check.
+"""
+
+MOVE_KINDS = ("two_opt", "or_opt", "segment_swap")
+
+# Largest block moved by or_opt.
+MAX_BLOCK = 3
+
+
+class Move:
+    """A candidate edit of a route.
+
+    - `kind`: one of MOVE_KINDS
+    - `delta`: change in static distance (negative = shorter)
+    - `lo`, `hi`: the route matches the original at every index <= lo
+      and > hi
+    - `args`: kind-specific indexes consumed by `apply()`
+    """
+
+    __slots__ = ("kind", "delta", "lo", "hi", "args")
+
+    def __init__(self, kind, delta, lo, hi, args):
+        self.kind = kind
+        self.delta = delta
+        self.lo = lo
+        self.hi = hi
+        self.args = args
+
+    def apply(self, route):
+        """Return the edited copy of `route`."""
+        if self.kind == "two_opt":
+            i, j = self.args
+            return route[:i + 1] + route[i + 1:j + 1][::-1] + route[j + 1:]
+        if self.kind == "or_opt":
+            s, e, p, rev = self.args
+            block = route[s:e + 1]
+            if rev:
+                block = block[::-1]
+            if p > e:
+                return route[:s] + route[e + 1:p + 1] + block + route[p + 1:]
+            return route[:p + 1] + block + route[p + 1:s] + route[e + 1:]
+        i, j, k = self.args
+        return route[:i + 1] + route[j + 1:k + 1] + route[i + 1:j + 1] + route[k + 1:]
+
+
+def neighbor_lists(paths, nodes, k=8):
+    """Return {node: up to k other nodes of `nodes`, nearest first}.
+
+    `paths` is a DistanceMatrix; unreachable nodes are never neighbors.
+    """
+    unique = list(dict.fromkeys(n for n in nodes if n in paths.index))
+    cols = [paths.index[n] for n in unique]
+    neighbors = {}
+    for node in unique:
+        row = paths.dist[paths.index[node]]
+        ranked = sorted(
+            (row[c], other) for c, other in zip(cols, unique)
+            if other != node and row[c] != float("inf")
+        )
+        neighbors[node] = [other for _d, other in ranked[:k]]
+    return neighbors
+
+
+class _Screen:
+    """O(1) static-distance deltas for moves on one route."""
+
+    def __init__(self, route, paths, rows=None):
+        self.route = route
+        index = paths.index
+        self.idx = [index.get(n, -1) for n in route]
+        self.rows = rows if rows is not None else paths.dist.tolist()
+        self.positions = {}
+        for pos, node in enumerate(route):
+            self.positions.setdefault(node, []).append(pos)
+
+    def d(self, a, b):
+        """Distance between the nodes at route positions a and b."""
+        i = self.idx[a]
+        j = self.idx[b]
+        if i < 0 or j < 0:
+            return float("inf")
+        return self.rows[i][j]
+
+    def two_opt(self, i, j):
+        d = self.d
+        return d(i, j) + d(i + 1, j + 1) - d(i, i + 1) - d(j, j + 1)
+
+    def or_opt(self, s, e, p, rev):
+        d = self.d
+        first, last = (e, s) if rev else (s, e)
+        removed = d(s - 1, s) + d(e, e + 1) - d(s - 1, e + 1)
+        inserted = d(p, first) + d(last, p + 1) - d(p, p + 1)
+        return inserted - removed
+
+    def segment_swap(self, i, j, k):
+        d = self.d
+        return (
+            d(i, j + 1) + d(k, i + 1) + d(j, k + 1)
+            - d(i, i + 1) - d(j, j + 1) - d(k, k + 1)
+        )
+
+
+def iter_moves(route, paths, neighbors, i, kinds=MOVE_KINDS):
+    """Yield statically improving Moves anchored at route position `i`.
+
+    Every move creates an edge from route[i] (or route[i + 1]) to one of
+    its neighbors, which keeps the scan at O(k) per position for two_opt
+    and or_opt and O(k^2) for segment_swap.
+    """
+    screen = _Screen(route, paths)
+    return _iter_moves(screen, neighbors, i, kinds)
+
+
+def _iter_moves(screen, neighbors, i, kinds):
+    route = screen.route
+    last = len(route) - 2  # route[-1] stays in place
+    positions = screen.positions
+    eps = 1e-6
+
+    if "two_opt" in kinds and i <= last:
+        # new edge route[i] - route[j]
+        for c in neighbors.get(route[i], ()):
+            for j in positions.get(c, ()):
+                if i + 1 < j <= last:
+                    delta = screen.two_opt(i, j)
+                    if delta < -eps:
+                        yield Move("two_opt", delta, i, j, (i, j))
+        # new edge route[i + 1] - route[j + 1]
+        for c in neighbors.get(route[i + 1], ()) if i + 1 <= last else ():
+            for q in positions.get(c, ()):
+                j = q - 1
+                if i + 1 < j <= last:
+                    delta = screen.two_opt(i, j)
+                    if delta < -eps:
+                        yield Move("two_opt", delta, i, j, (i, j))
+
+    if "or_opt" in kinds and 1 <= i:
+        # move the block starting at route[i] next to one of its neighbors
+        for length in range(1, MAX_BLOCK + 1):
+            s, e = i, i + length - 1
+            if e > last:
+                break
+            for c in neighbors.get(route[s], ()):
+                for q in positions.get(c, ()):
+                    # forward after c, or reversed before c
+                    for p, rev in ((q, False), (q - 1, True)):
+                        if not (0 <= p <= last and (p < s - 1 or p > e)):
+                            continue
+                        delta = screen.or_opt(s, e, p, rev)
+                        if delta < -eps:
+                            if p > e:
+                                yield Move("or_opt", delta, s - 1, p, (s, e, p, rev))
+                            else:
+                                yield Move("or_opt", delta, p, e, (s, e, p, rev))
+
+    if "segment_swap" in kinds and i + 2 <= last:
+        # new edges route[i] - route[j + 1] and route[k] - route[i + 1]
+        near_i = neighbors.get(route[i], ())
+        near_next = neighbors.get(route[i + 1], ())
+        for c in near_i:
+            for q in positions.get(c, ()):
+                j = q - 1
+                if not (i < j < last):
+                    continue
+                for e_node in near_next:
+                    for k in positions.get(e_node, ()):
+                        if j < k <= last:
+                            delta = screen.segment_swap(i, j, k)
+                            if delta < -eps:
+                                yield Move("segment_swap", delta, i, k, (i, j, k))
+
+
+def double_bridge(route, rng, frozen=None, max_segment=30):
+    """Random segment exchange used as a kick by iterated local search.
+
+    Cuts the route into A B C D and returns the Move giving A C B D, with
+    B and C at most `max_segment` nodes long. On an open route this is the
+    double-bridge kick; like every move here it keeps both endpoints and
+    stays clear of the `frozen` (start, end) index range.
+
+    Returns None if no stretch of the route is long enough.
+    """
+    last = len(route) - 2
+    spans = [(0, last)]
+    if frozen is not None:
+        spans = [(0, frozen[0] - 1), (frozen[1] + 1, last)]
+    spans = [(a, b) for a, b in spans if b - a >= 2]
+    if not spans:
+        return None
+    weights = [b - a for a, b in spans]
+    lo, hi = rng.choices(spans, weights=weights)[0]
+    while True:
+        i = rng.randint(lo, hi - 2)
+        j = i + rng.randint(1, max_segment)
+        k = j + rng.randint(1, max_segment)
+        if k <= hi:
+            return Move("segment_swap", 0.0, i, k, (i, j, k))
+
+
+def first_improvement(route, state, evaluate, paths, neighbors, kinds=MOVE_KINDS,
+                      frozen=None, max_passes=200, total=None):
+    """Deterministic first-improvement local search.
+
+    Scans route positions in order; at each one, statically improving moves
+    (see `iter_moves`) are passed to `evaluate(state, candidate, lo, hi)`,
+    which returns (total, new_state) for the candidate route (total None if
+    it can't be evaluated). The first move whose total beats the current
+    one is accepted and the scan continues from the same position. Stops
+    after a pass without improvement or `max_passes` passes.
+
+    `frozen` is an optional (start, end) index range that no move may touch
+    (moves never shift it, so it's fixed for the whole search). Pass the
+    route's `total` along with its `state` if it's already known.
+
+    Returns (route, state, total, passes).
+    """
+    if total is None:
+        total, state = evaluate(state, route, None, None)
+    if total is None:
+        total = float("inf")
+    rows = paths.dist.tolist()
+    passes = 0
+    improved = True
+    while improved and passes < max_passes:
+        improved = False
+        passes += 1
+        screen = _Screen(route, paths, rows)
+        i = 0
+        while i < len(route) - 2:
+            accepted = False
+            for move in _iter_moves(screen, neighbors, i, kinds):
+                if frozen is not None and not (move.hi < frozen[0] or move.lo > frozen[1]):
+                    continue
+                candidate = move.apply(route)
+                cand_total, cand_state = evaluate(state, candidate, move.lo, move.hi)
+                if cand_total is not None and cand_total < total:
+                    route, state, total = candidate, cand_state, cand_total
+                    screen = _Screen(route, paths, rows)
+                    improved = accepted = True
+                    break
+            if not accepted:
+                i += 1
+    return route, state, total, passes
@@ -0,0 +1,154 @@
+"""Two-layer map rendering: a cached static base plus a per-route overlay.
+
+The static part of a map (every grey node and edge, the schematic image,
+titles) is rasterized once into an RGBA pixel buffer (`BaseLayer`). Each
+route render then only draws the highlighted route onto a transparent figure
+with the same size and axes geometry, and alpha-composites it over the
+cached buffer. Used by app/map_visualizer.py and tube_challenge.visualize_route.
+
+Figures are created with the Agg canvas directly (no pyplot state), so
+renders don't accumulate open figures and are safe from request threads.
+"""
+import io
+import json
+import os
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+import matplotlib.image
+
+
+class BaseLayer:
+    """Rasterized static background plus the geometry needed to align overlays.
+
+    - `rgba`: uint8 array (height, width, 4), straight alpha
+    - `figsize`, `dpi`: figure size in inches and resolution
+    - `axes_bounds`: (left, bottom, width, height) of the drawn axes in
+      figure coordinates, after aspect adjustment
+    - `xlim`, `ylim`: data limits of the drawn axes
+    """
+
+    def __init__(self, rgba, figsize, dpi, axes_bounds, xlim, ylim):
+        self.rgba = rgba
+        self.figsize = tuple(figsize)
+        self.dpi = dpi
+        self.axes_bounds = tuple(axes_bounds)
+        self.xlim = tuple(xlim)
+        self.ylim = tuple(ylim)
+
+    def save(self, path_prefix):
+        """Write `<prefix>.npy` (pixels) and `<prefix>.json` (geometry) atomically."""
+        npy_path = path_prefix + ".npy"
+        meta_path = path_prefix + ".json"
+        tmp = f".{os.getpid()}.tmp"
+        with open(npy_path + tmp, "wb") as f:
+            np.save(f, self.rgba)
+        os.replace(npy_path + tmp, npy_path)
+        with open(meta_path + tmp, "w") as f:
+            json.dump({
+                "figsize": list(self.figsize),
+                "dpi": self.dpi,
+                "axes_bounds": list(self.axes_bounds),
+                "xlim": list(self.xlim),
+                "ylim": list(self.ylim),
+            }, f)
+        os.replace(meta_path + tmp, meta_path)
+
+    @classmethod
+    def load(cls, path_prefix):
+        """Memory-map a layer written by `save()`; returns None if missing."""
+        try:
+            with open(path_prefix + ".json", "r") as f:
+                meta = json.load(f)
+            rgba = np.load(path_prefix + ".npy", mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        return cls(rgba, meta["figsize"], meta["dpi"], meta["axes_bounds"], meta["xlim"], meta["ylim"])
+
+
+def render_base_layer(draw, figsize=None, dpi=100):
+    """Rasterize the static background.
+
+    `draw(fig, ax)` draws everything that doesn't depend on the route and
+    may change the axes limits, aspect and layout; the final geometry is
+    captured so overlays line up pixel for pixel.
+    """
+    fig = Figure(figsize=figsize, dpi=dpi)
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    draw(fig, ax)
+    canvas.draw()
+    return BaseLayer(
+        np.array(canvas.buffer_rgba()),
+        fig.get_size_inches(),
+        dpi,
+        ax.get_position(original=False).bounds,
+        ax.get_xlim(),
+        ax.get_ylim(),
+    )
+
+
+def render_overlay(base, draw):
+    """Draw a route overlay aligned with `base` and return the composited RGBA array.
+
+    `draw(fig, ax)` gets a transparent figure whose axes match the base
+    layer; limits are restored afterwards in case drawing autoscaled them.
+    """
+    fig = Figure(figsize=base.figsize, dpi=base.dpi)
+    canvas = FigureCanvasAgg(fig)
+    fig.patch.set_alpha(0)
+    ax = fig.add_axes(base.axes_bounds)
+    ax.set_axis_off()
+    draw(fig, ax)
+    ax.set_xlim(base.xlim)
+    ax.set_ylim(base.ylim)
+    canvas.draw()
+    return alpha_composite(base.rgba, np.asarray(canvas.buffer_rgba()))
+
+
+def alpha_composite(base, overlay):
+    """Composite straight-alpha RGBA `overlay` over `base` (both uint8, same shape).
+
+    Only pixels the overlay actually touches are blended; route overlays
+    cover a small fraction of the map.
+    """
+    out = np.array(base, dtype=np.uint8)
+    touched = overlay[..., 3] > 0
+    if not touched.any():
+        return out
+    top = overlay[touched].astype(np.float32) / 255.0
+    bottom = out[touched].astype(np.float32) / 255.0
+    top_a = top[:, 3:4]
+    bottom_a = bottom[:, 3:4]
+    out_a = top_a + bottom_a * (1.0 - top_a)
+    out_rgb = top[:, :3] * top_a + bottom[:, :3] * bottom_a * (1.0 - top_a)
+    out_rgb = np.divide(out_rgb, out_a, out=np.zeros_like(out_rgb), where=out_a > 0)
+    blended = np.concatenate([out_rgb, out_a], axis=-1)
+    out[touched] = np.round(blended * 255.0).astype(np.uint8)
+    return out
+
+
+def trim_margins(rgba, pad=0):
+    """Crop uniform background borders (the top-left pixel's color), keeping `pad` pixels.
+
+    Approximates savefig's bbox_inches="tight" for composited images.
+    """
+    background = rgba[0, 0]
+    content = np.any(rgba != background, axis=-1)
+    rows = np.flatnonzero(content.any(axis=1))
+    cols = np.flatnonzero(content.any(axis=0))
+    if rows.size == 0 or cols.size == 0:
+        return rgba
+    top = max(0, rows[0] - pad)
+    bottom = min(rgba.shape[0], rows[-1] + 1 + pad)
+    left = max(0, cols[0] - pad)
+    right = min(rgba.shape[1], cols[-1] + 1 + pad)
+    return rgba[top:bottom, left:right]
+
+
+def encode_png(rgba, dpi=None):
+    """Encode an RGBA array as PNG bytes."""
+    buffer = io.BytesIO()
+    matplotlib.image.imsave(buffer, rgba, format="png", dpi=dpi)
+    return buffer.getvalue()
@@ -1,13 +1,17 @@
 import argparse
 import json
 import random
+import time
+from datetime import date, datetime, timedelta
 
 import networkx as nx
-from dijkstras import dijkstra
+from contraction import ContractionHierarchy
 from InquirerPy import inquirer
 
 # load metro #
 graph = nx.read_graphml("datasets/tokyometro.graphml")
+# contracted once and cached next to the graphml
+hierarchy = ContractionHierarchy.load_or_build(graph, "datasets/tokyometro.ch.npz")
 
 # implement all translation maps
 FILE_PATH = "datasets/secondary.json"
@@ -34,17 +38,17 @@ letter_to_line = {
 
 def get_route(start: str, end: str, verbose: bool = False) -> str:
     """
-    Get the route from start to end using Dijkstra's algorithm.
+    Get the route from start to end using the contraction hierarchy.
     :param start: Starting station code.
     :param end: Ending station code.
     :param verbose: If True, print detailed path steps.
     :return: Formatted string of the route.
     """
-    dji = dijkstra(graph, tertiary[start], tertiary[end])
+    dji = hierarchy.query(tertiary[start], tertiary[end])
     total_real_distance = 0.0
 
     if verbose:
-        print("Raw path from dijkstra:")
+        print("Raw path from the contraction hierarchy:")
 
     for idx in range(len(dji[1]) - 1):
         node = dji[1][idx]
@@ -102,6 +106,106 @@ def get_route(start: str, end: str, verbose: bool = False) -> str:
     return output
 
 
+def _clock(minutes) -> str:
+    minutes = int(round(minutes))
+    return f"{minutes // 60 % 24:02d}:{minutes % 60:02d}"
+
+
+def _line_label(line: str) -> str:
+    # timetable names are "<operator>-<line>", e.g. "tokyometro-ginza"
+    return line.split("-", 1)[-1].title()
+
+
+def get_timed_route(start: str, end: str, depart: datetime, verbose: bool = False) -> str:
+    """
+    Get the earliest-arriving timed journey from start to end.
+    :param start: Starting station name.
+    :param end: Ending station name.
+    :param depart: Earliest departure; its date picks the service calendar.
+    :param verbose: If True, print trip ids and query time.
+    :return: Formatted string of the journey.
+    """
+    # the timetable stack pulls in matplotlib; only load it for timed queries
+    from timetable_index import service_day_for_date, timetables_for_service_day
+    from tube_challenge import _norm, build_journey_planner, load_timetables
+
+    service_day = service_day_for_date(depart.date())
+    timetables = timetables_for_service_day(load_timetables(), service_day)
+    planner = build_journey_planner(graph, secondary, timetables)
+
+    depart_min = depart.hour * 60 + depart.minute
+    began = time.perf_counter()
+    legs = planner.earliest_arrival(_norm(start), _norm(end), depart_min)
+    elapsed_ms = (time.perf_counter() - began) * 1000
+
+    if verbose:
+        print(f"Using {service_day} timetables, {len(planner)} connections")
+        print(f"Connection scan took {elapsed_ms:.1f} ms")
+    if legs is None:
+        return f"No connection from {start} to {end} after {_clock(depart_min)}\n"
+
+    output = ""
+    previous = None
+    for leg in legs:
+        station = planner.display(leg.from_stop)
+        if leg.line is None:
+            output += (
+                _clock(leg.depart) + " Walk from " + station + " to " + planner.display(leg.to_stop)
+                + " Station (" + str(round(leg.arrive - leg.depart)) + " min)\n"
+            )
+            continue
+        verb = "Board" if previous is None else "Transfer to"
+        output += (
+            _clock(leg.depart) + " " + verb + " the " + _line_label(leg.line)
+            + " line at " + station + " Station\n"
+        )
+        if verbose:
+            output += "      trip " + leg.trip_id + "\n"
+        previous = leg
+    arrive_min = legs[-1].arrive if legs else depart_min
+    output += _clock(arrive_min) + " Arrive at " + end + " Station\n"
+    output += "Total travel time: " + str(round(arrive_min - depart_min)) + " min\n"
+    return output
+
+
+def get_profile(start: str, end: str, window_from: datetime, window_to: datetime, verbose: bool = False) -> str:
+    """
+    List every Pareto-optimal journey from start to end leaving within a window.
+    :param start: Starting station name.
+    :param end: Ending station name.
+    :param window_from: Earliest departure; its date picks the service calendar.
+    :param window_to: Latest departure.
+    :param verbose: If True, print the query time.
+    :return: Formatted table of (departure, arrival, transfers).
+    """
+    from timetable_index import service_day_for_date, timetables_for_service_day
+    from tube_challenge import _norm, build_journey_planner, load_timetables
+
+    service_day = service_day_for_date(window_from.date())
+    timetables = timetables_for_service_day(load_timetables(), service_day)
+    planner = build_journey_planner(graph, secondary, timetables)
+
+    from_min = window_from.hour * 60 + window_from.minute
+    to_min = from_min + (window_to - window_from).total_seconds() / 60
+    began = time.perf_counter()
+    journeys = planner.profile(_norm(start), _norm(end), from_min, to_min)
+    elapsed_ms = (time.perf_counter() - began) * 1000
+
+    if verbose:
+        print(f"Using {service_day} timetables, {len(planner)} connections")
+        print(f"Profile scan took {elapsed_ms:.1f} ms")
+    if not journeys:
+        return f"No connection from {start} to {end} between {_clock(from_min)} and {_clock(to_min)}\n"
+
+    output = f"Journeys from {start} to {end}:\n"
+    output += "Depart  Arrive  Minutes  Transfers\n"
+    for depart, arrive, transfers in journeys:
+        output += (
+            f"{_clock(depart)}   {_clock(arrive)}   {round(arrive - depart):>7}  {transfers:>9}\n"
+        )
+    return output
+
+
 def main(args):
 
     if not args.start:
@@ -124,11 +228,52 @@ def main(args):
         print(f"Invalid ending station: {args.end}")
         return
 
-    ROUTE = get_route(args.start, args.end, args.verbose)
+    if args.profile:
+        window = _parse_window(args.profile)
+        if window is None:
+            print(f"Invalid departure window: {args.profile}")
+            return
+        ROUTE = get_profile(args.start, args.end, window[0], window[1], args.verbose)
+    elif args.depart:
+        depart = _parse_depart(args.depart)
+        if depart is None:
+            print(f"Invalid departure time: {args.depart}")
+            return
+        ROUTE = get_timed_route(args.start, args.end, depart, args.verbose)
+    else:
+        ROUTE = get_route(args.start, args.end, args.verbose)
 
     print("\n" + ROUTE + "\n")
 
 
+def _parse_depart(value):
+    for fmt in ("%Y-%m-%d %H:%M", "%H:%M"):
+        try:
+            parsed = datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+        if fmt == "%H:%M":
+            return datetime.combine(date.today(), parsed.time())
+        return parsed
+    return None
+
+
+def _parse_window(value):
+    # "[YYYY-MM-DD ]HH:MM-HH:MM"; the end may be past midnight of the start
+    first, sep, last = value.rpartition("-")
+    window_from = _parse_depart(first) if sep else None
+    try:
+        end_time = datetime.strptime(last, "%H:%M").time()
+    except ValueError:
+        return None
+    if window_from is None:
+        return None
+    window_to = datetime.combine(window_from.date(), end_time)
+    if window_to < window_from:
+        window_to += timedelta(days=1)
+    return window_from, window_to
+
+
 def parse_args():
     """Parse command line arguments."""
     parser = argparse.ArgumentParser(description="Tokyo Metro Route Finder")
@@ -142,6 +287,17 @@ def parse_args():
         type=str,
         help="Ending station (e.g., 'Nishi-magome')",
     )
+    parser.add_argument(
+        "--depart",
+        type=str,
+        help="Plan a timed journey leaving at 'HH:MM' or 'YYYY-MM-DD HH:MM' (uses timetables)",
+    )
+    parser.add_argument(
+        "--profile",
+        type=str,
+        help="List the fastest journeys for every departure in '[YYYY-MM-DD ]HH:MM-HH:MM' "
+             "and their transfer trade-offs (uses timetables)",
+    )
     parser.add_argument(
         "-v",
         "--verbose",
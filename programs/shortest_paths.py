@@ -0,0 +1,117 @@
+"""All-pairs shortest paths over the metro graph as NumPy matrices.
+
+`DistanceMatrix` maps node ids to integer indexes and holds a distance and a
+predecessor matrix computed with a vectorized Floyd–Warshall. Building one
+for the ~300-node metro graph takes a fraction of a second, after which
+distance lookups are O(1) and paths are reconstructed by walking
+predecessors, so tube_challenge computes it once per graph (and once per
+perturbed graph) instead of running networkx Dijkstra per pair.
+"""
+import numpy as np
+
+from array_graph import ArrayGraph
+
+
+def floyd_warshall(weights):
+    """Return (dist, pred) for a dense weight matrix (np.inf = no edge).
+
+    `pred[i, j]` is the node preceding j on a shortest i -> j path, or -1
+    when j is unreachable from i (or i == j).
+    """
+    n = weights.shape[0]
+    dist = np.array(weights, dtype=float)
+    np.fill_diagonal(dist, 0.0)
+    pred = np.where(np.isfinite(dist), np.arange(n)[:, None], -1)
+    np.fill_diagonal(pred, -1)
+    # scratch matrices reused by every pass instead of allocated per pass
+    via = np.empty_like(dist)
+    better = np.empty(dist.shape, dtype=bool)
+    # row k never improves during pass k (dist[k, k] == 0), so it can be
+    # broadcast while dist/pred are updated in place
+    for k in range(n):
+        np.add(dist[:, k, None], dist[k, None, :], out=via)
+        np.less(via, dist, out=better)
+        np.copyto(dist, via, where=better)
+        np.copyto(pred, np.broadcast_to(pred[k], pred.shape), where=better)
+    return dist, pred
+
+
+class DistanceMatrix:
+    """Shortest-path distances and predecessors between every pair of nodes.
+
+    - `nodes`: node ids in matrix order
+    - `index`: node id -> row/column
+    - `dist`: float matrix of shortest-path weights (np.inf if unreachable)
+    - `pred`: int matrix of predecessors used by `path()`
+    """
+
+    def __init__(self, nodes, dist, pred):
+        self.nodes = list(nodes)
+        self.index = {node: i for i, node in enumerate(self.nodes)}
+        self.dist = dist
+        self.pred = pred
+
+    @classmethod
+    def from_graph(cls, graph, weight="weight", nodes=None, weights=None):
+        """Build from a networkx graph; missing weights count as 1 like networkx.
+
+        An ArrayGraph's `weights` array is used directly (no per-edge dicts);
+        pass `weights` to route it with another per-edge weight vector
+        (e.g. a perturbed one) without building a reweighted graph.
+        """
+        if nodes is None:
+            nodes = list(graph.nodes())
+        index = {node: i for i, node in enumerate(nodes)}
+        if isinstance(graph, ArrayGraph) and weight == "weight":
+            edge_weights = graph.weights if weights is None else weights
+            weights = np.full((len(nodes), len(nodes)), np.inf)
+            to_row = np.array([index[node] for node in graph.node_ids], dtype=np.intp)
+            i = to_row[graph.edge_u]
+            j = to_row[graph.edge_v]
+            np.minimum.at(weights, (i, j), edge_weights)
+            if not graph.is_directed():
+                np.minimum.at(weights, (j, i), edge_weights)
+            return cls(nodes, *floyd_warshall(weights))
+        if weights is not None:
+            raise ValueError("Per-edge weights need an ArrayGraph")
+        weights = np.full((len(nodes), len(nodes)), np.inf)
+        undirected = not graph.is_directed()
+        for u, v, data in graph.edges(data=True):
+            w = data.get(weight, 1)
+            i, j = index[u], index[v]
+            if w < weights[i, j]:
+                weights[i, j] = w
+            if undirected and w < weights[j, i]:
+                weights[j, i] = w
+        return cls(nodes, *floyd_warshall(weights))
+
+    def reweighted(self, graph, weight="weight", weights=None):
+        """Rebuild for a graph with the same nodes but different edge weights
+        (e.g. an ArrayGraph plus a `weights` vector from
+        perturbed_edge_weights), keeping this matrix's node order."""
+        return DistanceMatrix.from_graph(graph, weight=weight, nodes=self.nodes, weights=weights)
+
+    def distance(self, u, v):
+        """Shortest-path weight from u to v (inf if unknown or unreachable)."""
+        i = self.index.get(u)
+        j = self.index.get(v)
+        if i is None or j is None:
+            return float("inf")
+        return float(self.dist[i, j])
+
+    def path(self, u, v):
+        """Node list of a shortest u -> v path, or None if there is none."""
+        i = self.index.get(u)
+        j = self.index.get(v)
+        if i is None or j is None:
+            return None
+        if i == j:
+            return [u]
+        if self.pred[i, j] < 0:
+            return None
+        rev = [j]
+        while j != i:
+            j = int(self.pred[i, j])
+            rev.append(j)
+        nodes = self.nodes
+        return [nodes[k] for k in reversed(rev)]
@@ -133,7 +133,7 @@ if path[len(path) - 1] not in hold:
 print(hold)
 node_label_dict = {}
 for i in hold:
-    node_label_dict[i] = dijkstras.secondary[i]
+    node_label_dict[i] = names[i]
 print(node_label_dict)
 nx.set_node_attributes(graph, node_label_dict, "label")
 
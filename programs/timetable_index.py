@@ -0,0 +1,408 @@
+"""Compiled timetable index used by tube_challenge.
+
+Each timetable file is wrapped in a `LineTimetable`. The first time a
+(from_station, to_station) pair is queried, the matching trips are compiled
+into departures as sorted integer minutes since midnight, with aligned
+arrivals and trip ids. Later queries for the same pair are a `bisect` plus a
+short forward scan instead of a walk over every trip of the line.
+`next_trips` answers the same query for a whole array of ready times at
+once (used to time a route for many start times in one pass).
+
+Trips are stored as a NumPy structured array (trip id plus per-station time
+and stop-order columns). `TimetableCache` persists these arrays as `.npy`
+files keyed by the source JSON's mtime and size, and memory-maps them on
+later runs so the ~50 MB of timetable JSON is only parsed when it changes.
+
+Trip ids carry a service calendar (`...Weekday`, `...SaturdayHoliday`,
+`...Saturday`, `...Holiday`); `for_service_day()` narrows a timetable to the
+trips that actually run on a given kind of day.
+"""
+import json
+import os
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+
+MINUTES_PER_DAY = 24 * 60
+
+# Bump when the on-disk layout written by TimetableCache changes.
+CACHE_VERSION = 1
+
+# Trip id calendar suffixes that run on each kind of service day.
+SERVICE_CALENDARS = {
+    "weekday": ("Weekday",),
+    "saturday": ("Saturday", "SaturdayHoliday"),
+    "holiday": ("Holiday", "SaturdayHoliday"),
+}
+_KNOWN_CALENDARS = {cal for cals in SERVICE_CALENDARS.values() for cal in cals}
+
+
+def parse_minutes(time_str):
+    """Convert an 'HH:MM' string to minutes since midnight (None if malformed).
+
+    Hours past 24 (e.g. '24:15' for after-midnight trains) are kept as-is.
+    """
+    try:
+        h, m = map(int, time_str.split(":"))
+    except Exception:
+        return None
+    return h * 60 + m
+
+
+def trip_calendar(trip_id):
+    """Return the calendar suffix of a trip id (e.g. 'Weekday'), or None.
+
+    Some ids carry a trailing variant number ('...Weekday.1'), so the last
+    known calendar component wins rather than strictly the final one.
+    """
+    for part in reversed((trip_id or "").split(".")):
+        if part in _KNOWN_CALENDARS:
+            return part
+    return None
+
+
+def service_day_for_date(d):
+    """Map a date to a SERVICE_CALENDARS key by day of week.
+
+    Public holidays are not detected; pass the service day explicitly for
+    those (tube_challenge's --service-day).
+    """
+    weekday = d.weekday()
+    if weekday < 5:
+        return "weekday"
+    if weekday == 5:
+        return "saturday"
+    return "holiday"
+
+
+def timetables_for_service_day(timetables, service_day):
+    """Return {filename: LineTimetable} restricted to trips running on `service_day`."""
+    return {name: line_tt.for_service_day(service_day) for name, line_tt in timetables.items()}
+
+
+class SegmentIndex:
+    """Departures for one station pair of one line, sorted by departure.
+
+    - `departures`: minutes since midnight, ascending
+    - `arrivals`: minutes since midnight, aligned with `departures`
+      (already rolled over by a day when the trip crosses midnight)
+    - `trip_ids`: trip ids aligned with `departures`
+    """
+
+    __slots__ = ("departures", "arrivals", "trip_ids", "_arrays")
+
+    def __init__(self, departures, arrivals, trip_ids):
+        self.departures = departures
+        self.arrivals = arrivals
+        self.trip_ids = trip_ids
+        self._arrays = None
+
+    def __len__(self):
+        return len(self.departures)
+
+    def earliest_arrival(self, lo, hi):
+        """Return the index in [lo, hi) with the earliest arrival, or None.
+
+        Ties keep the earliest departure. The scan stops as soon as a
+        departure is no earlier than the best arrival seen so far, since no
+        later train can arrive before it.
+        """
+        departures = self.departures
+        arrivals = self.arrivals
+        best = None
+        best_arr = None
+        for k in range(lo, hi):
+            if best is not None and departures[k] >= best_arr:
+                break
+            if best is None or arrivals[k] < best_arr:
+                best = k
+                best_arr = arrivals[k]
+        return best
+
+    def arrays(self):
+        """Return (departures, arrivals, best) as NumPy arrays for vectorized queries.
+
+        `best[k]` is what `earliest_arrival(k, len(self))` returns: the
+        first index of the earliest arrival among departures k onwards.
+        """
+        if self._arrays is None:
+            arrivals = self.arrivals
+            best = np.empty(len(arrivals), dtype=np.intp)
+            b = len(arrivals) - 1
+            for k in range(len(arrivals) - 1, -1, -1):
+                if arrivals[k] <= arrivals[b]:
+                    b = k
+                best[k] = b
+            self._arrays = (
+                np.asarray(self.departures, dtype=np.float64),
+                np.asarray(arrivals, dtype=np.float64),
+                best,
+            )
+        return self._arrays
+
+
+class LineTimetable:
+    """All trips of one timetable file with lazily compiled lookups.
+
+    - `stations`: normalized station names, one column per station
+    - `trips`: structured array with fields `id`, `time` (minutes since
+      midnight per station column, -1 if the trip doesn't call there) and
+      `order` (stop index within the trip per column, -1 if absent)
+
+    Compiled segment and departure indexes are built from `trips` on first
+    use and memoized for the process lifetime.
+    """
+
+    def __init__(self, stations, trips):
+        self.stations = list(stations)
+        self.trips = trips
+        self._column = {name: i for i, name in enumerate(self.stations)}
+        self._segments = {}
+        self._departures = {}
+        self._service_days = {}
+
+    @classmethod
+    def from_trips(cls, trips):
+        """Build from parsed trip dicts (id, station_idx, station_time)."""
+        stations = []
+        column = {}
+        for trip in trips:
+            for norm in trip.get("station_idx", {}):
+                if norm not in column:
+                    column[norm] = len(stations)
+                    stations.append(norm)
+        id_len = max([len(trip.get("id") or "") for trip in trips] + [1])
+        arr = np.zeros(len(trips), dtype=_trip_dtype(id_len, len(stations)))
+        arr["time"] = -1
+        arr["order"] = -1
+        for row, trip in enumerate(trips):
+            arr["id"][row] = trip.get("id") or ""
+            stime = trip.get("station_time", {})
+            for norm, idx in trip.get("station_idx", {}).items():
+                col = column[norm]
+                arr["order"][row, col] = idx
+                minutes = parse_minutes(stime.get(norm) or "")
+                if minutes is not None:
+                    arr["time"][row, col] = minutes
+        return cls(stations, arr)
+
+    def __len__(self):
+        return len(self.trips)
+
+    def for_service_day(self, service_day):
+        """Return a LineTimetable holding only the trips that run on `service_day`.
+
+        Trips whose id has no recognizable calendar are kept in every
+        partition. Partitions are memoized, so compiled indexes are shared
+        by every caller asking for the same service day.
+        """
+        part = self._service_days.get(service_day)
+        if part is None:
+            calendars = SERVICE_CALENDARS[service_day]
+            keep = []
+            for i, trip_id in enumerate(self.trips["id"].tolist()):
+                cal = trip_calendar(trip_id)
+                if cal is None or cal in calendars:
+                    keep.append(i)
+            part = LineTimetable(self.stations, self.trips[np.asarray(keep, dtype=np.intp)])
+            self._service_days[service_day] = part
+        return part
+
+    def segment(self, from_norm, to_norm):
+        """Return the compiled `SegmentIndex` for a normalized station pair."""
+        key = (from_norm, to_norm)
+        seg = self._segments.get(key)
+        if seg is None:
+            seg = self._compile_segment(from_norm, to_norm)
+            self._segments[key] = seg
+        return seg
+
+    def _compile_segment(self, from_norm, to_norm):
+        a = self._column.get(from_norm)
+        b = self._column.get(to_norm)
+        if a is None or b is None:
+            return SegmentIndex([], [], [])
+        times = self.trips["time"]
+        order = self.trips["order"]
+        dep = times[:, a].astype(np.int32)
+        arr = times[:, b].astype(np.int32)
+        mask = (order[:, a] >= 0) & (order[:, a] < order[:, b]) & (dep >= 0) & (arr >= 0)
+        rows = np.flatnonzero(mask)
+        dep = dep[rows]
+        arr = arr[rows]
+        arr = np.where(arr < dep, arr + MINUTES_PER_DAY, arr)
+        # stable sort on departure keeps file order for equal departures
+        by_dep = np.argsort(dep, kind="stable")
+        return SegmentIndex(
+            dep[by_dep].tolist(),
+            arr[by_dep].tolist(),
+            self.trips["id"][rows[by_dep]].tolist(),
+        )
+
+    def next_trip(self, from_norm, to_norm, earliest_min):
+        """Find the earliest-arriving trip from `from_norm` to `to_norm`.
+
+        `earliest_min` is minutes since midnight of the query date (may be
+        fractional). Only departures within 24 hours of it are considered.
+        When nothing departs the same day and the query is at 23:00 or later,
+        the next day's service is tried.
+
+        Returns (depart_min, arrive_min, trip_id) relative to the query's
+        midnight, or (None, None, None).
+        """
+        seg = self.segment(from_norm, to_norm)
+        if not seg:
+            return None, None, None
+        departures = seg.departures
+
+        lo = bisect_left(departures, earliest_min)
+        hi = bisect_right(departures, earliest_min + MINUTES_PER_DAY)
+        k = seg.earliest_arrival(lo, hi)
+        if k is not None:
+            return departures[k], seg.arrivals[k], seg.trip_ids[k]
+
+        if earliest_min >= 23 * 60:
+            lo = bisect_left(departures, earliest_min - MINUTES_PER_DAY)
+            hi = bisect_right(departures, earliest_min)
+            k = seg.earliest_arrival(lo, hi)
+            if k is not None:
+                return (
+                    departures[k] + MINUTES_PER_DAY,
+                    seg.arrivals[k] + MINUTES_PER_DAY,
+                    seg.trip_ids[k],
+                )
+
+        return None, None, None
+
+    def next_trips(self, from_norm, to_norm, earliest_min):
+        """Vectorized `next_trip` for an array of query minutes.
+
+        Returns (depart_min, arrive_min) float arrays aligned with
+        `earliest_min`, NaN where there's no trip. Queries whose 24-hour
+        window reaches past the last departure (the usual case) are answered
+        with one `searchsorted` and a precomputed suffix minimum; the rest
+        fall back to `next_trip`.
+        """
+        earliest_min = np.asarray(earliest_min, dtype=np.float64)
+        depart = np.full(earliest_min.shape, np.nan)
+        arrive = np.full(earliest_min.shape, np.nan)
+        seg = self.segment(from_norm, to_norm)
+        if not seg:
+            return depart, arrive
+        departures, arrivals, best = seg.arrays()
+        lo = np.searchsorted(departures, earliest_min, side="left")
+        hi = np.searchsorted(departures, earliest_min + MINUTES_PER_DAY, side="right")
+        fast = (hi == len(departures)) & (lo < hi)
+        k = best[lo[fast]]
+        depart[fast] = departures[k]
+        arrive[fast] = arrivals[k]
+        for i in np.flatnonzero(~fast):
+            dep_min, arr_min, _tid = self.next_trip(from_norm, to_norm, float(earliest_min[i]))
+            if dep_min is not None:
+                depart[i] = dep_min
+                arrive[i] = arr_min
+        return depart, arrive
+
+    def departures_from(self, from_norm):
+        """Return (sorted departure minutes, trip ids) for every trip calling at `from_norm`."""
+        index = self._departures.get(from_norm)
+        if index is None:
+            col = self._column.get(from_norm)
+            if col is None:
+                index = ([], [])
+            else:
+                dep = self.trips["time"][:, col]
+                rows = np.flatnonzero(dep >= 0)
+                rows = rows[np.argsort(dep[rows], kind="stable")]
+                index = (dep[rows].astype(np.int32).tolist(), self.trips["id"][rows].tolist())
+            self._departures[from_norm] = index
+        return index
+
+    def first_departure(self, from_norm, cutoff_min):
+        """Return (depart_min, trip_id) for the first departure at or after `cutoff_min`.
+
+        Falls back to the earliest known departure of the day when none is
+        left after the cutoff; returns (None, None) if the station is unserved.
+        """
+        departures, trip_ids = self.departures_from(from_norm)
+        if not departures:
+            return None, None
+        k = bisect_left(departures, cutoff_min)
+        if k == len(departures):
+            k = 0
+        return departures[k], trip_ids[k]
+
+
+def _trip_dtype(id_len, n_stations):
+    return np.dtype([
+        ("id", f"U{id_len}"),
+        ("time", np.int16, (n_stations,)),
+        ("order", np.int16, (n_stations,)),
+    ])
+
+
+class TimetableCache:
+    """On-disk cache of compiled LineTimetables, one `.npy` per source file.
+
+    Each `<name>.npy` holds the structured trips array and is memory-mapped
+    on load; `<name>.meta.json` records the source file's mtime and size and
+    the station column names. An entry is only used while both still match
+    the source JSON, otherwise it is rebuilt by the caller via `store()`.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+
+    def _paths(self, source_path):
+        stem = os.path.splitext(os.path.basename(source_path))[0]
+        base = os.path.join(self.cache_dir, stem)
+        return base + ".npy", base + ".meta.json"
+
+    @staticmethod
+    def _source_key(source_path):
+        st = os.stat(source_path)
+        return st.st_mtime_ns, st.st_size
+
+    def load(self, source_path):
+        """Return a memory-mapped LineTimetable, or None if missing or stale."""
+        npy_path, meta_path = self._paths(source_path)
+        try:
+            with open(meta_path, "r") as f:
+                meta = json.load(f)
+            mtime_ns, size = self._source_key(source_path)
+            if (
+                meta.get("version") != CACHE_VERSION
+                or meta.get("source_mtime_ns") != mtime_ns
+                or meta.get("source_size") != size
+            ):
+                return None
+            trips = np.load(npy_path, mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        stations = meta.get("stations", [])
+        if trips.dtype.names != ("id", "time", "order") or trips["time"].shape[1:] != (len(stations),):
+            return None
+        return LineTimetable(stations, trips)
+
+    def store(self, source_path, line_tt):
+        """Write `line_tt` for `source_path`; failures are ignored (cache is optional)."""
+        npy_path, meta_path = self._paths(source_path)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            mtime_ns, size = self._source_key(source_path)
+            # write to temp files and rename so concurrent runs never see partial data
+            tmp_npy = f"{npy_path}.{os.getpid()}.tmp"
+            with open(tmp_npy, "wb") as f:
+                np.save(f, np.asarray(line_tt.trips))
+            os.replace(tmp_npy, npy_path)
+            tmp_meta = f"{meta_path}.{os.getpid()}.tmp"
+            with open(tmp_meta, "w") as f:
+                json.dump({
+                    "version": CACHE_VERSION,
+                    "source_mtime_ns": mtime_ns,
+                    "source_size": size,
+                    "stations": line_tt.stations,
+                }, f)
+            os.replace(tmp_meta, meta_path)
+        except OSError:
+            pass
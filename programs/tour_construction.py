@@ -0,0 +1,233 @@
+"""Tour construction heuristics over a distance matrix.
+
+Each constructor takes a symmetric matrix `dist` (NumPy, n x n, e.g. the
+rows and columns of a DistanceMatrix for the nodes to visit) and returns a
+closed tour as a list of the indexes 0..n-1, each once; the tour returns
+from the last index to the first. `open_tour` turns it into an open path.
+
+- `nearest_neighbor`: repeatedly go to the closest unvisited node
+- `greedy_edge`: add the shortest edges that keep every node at degree
+  <= 2 without closing a cycle early
+- `savings`: Clarke-Wright; like greedy_edge, ranked by the distance saved
+  over going back to a central hub between the two nodes
+- `christofides`: minimum spanning tree plus a matching of its odd-degree
+  nodes, walked as an Euler circuit with repeated nodes skipped
+
+Ties go to the lower index, so the result depends on the matrix's node
+order (callers shuffle it to vary the tours they get).
+"""
+import numpy as np
+
+CONSTRUCTIONS = ("christofides", "savings", "greedy", "nearest")
+
+
+def construct_tour(dist, method="christofides"):
+    """Run the constructor named by `method` (one of CONSTRUCTIONS)."""
+    if method == "christofides":
+        return christofides(dist)
+    if method == "savings":
+        return savings(dist)
+    if method == "greedy":
+        return greedy_edge(dist)
+    if method == "nearest":
+        return nearest_neighbor(dist)
+    raise ValueError(f"Unknown tour construction: {method}")
+
+
+def open_tour(tour, dist):
+    """Rotate a closed tour so its heaviest edge is the one left out.
+
+    Returns the open path visiting every node once (what networkx's
+    `traveling_salesman_problem(cycle=False)` returns).
+    """
+    n = len(tour)
+    if n < 2:
+        return list(tour)
+    # edge k runs from tour[k] to tour[k + 1], wrapping around
+    nxt = np.roll(tour, -1)
+    k = int(np.argmax(dist[tour, nxt]))
+    return list(tour[k + 1:]) + list(tour[:k + 1])
+
+
+def nearest_neighbor(dist, start=0):
+    n = len(dist)
+    visited = np.zeros(n, dtype=bool)
+    tour = [start]
+    visited[start] = True
+    for _ in range(n - 1):
+        row = np.where(visited, np.inf, dist[tour[-1]])
+        nxt = int(np.argmin(row))
+        tour.append(nxt)
+        visited[nxt] = True
+    return tour
+
+
+def greedy_edge(dist):
+    n = len(dist)
+    i, j = np.triu_indices(n, 1)
+    order = np.argsort(dist[i, j], kind="stable")
+    return _join_edges(n, i[order].tolist(), j[order].tolist())
+
+
+def savings(dist, hub=None):
+    """Clarke-Wright savings tour around `hub` (default: the most central node)."""
+    n = len(dist)
+    if n < 3:
+        return list(range(n))
+    if hub is None:
+        hub = int(np.argmin(dist.sum(axis=1)))
+    others = np.array([k for k in range(n) if k != hub])
+    i, j = np.triu_indices(len(others), 1)
+    i, j = others[i], others[j]
+    saved = dist[hub, i] + dist[hub, j] - dist[i, j]
+    order = np.argsort(-saved, kind="stable")
+    path = _join_edges(n, i[order].tolist(), j[order].tolist(), skip=hub)
+    return [hub] + path
+
+
+def _join_edges(n, us, vs, skip=None):
+    """Accept candidate edges (us[k], vs[k]) in order into one Hamiltonian path.
+
+    An edge is taken if both ends still have degree < 2 and it doesn't
+    close a cycle. Returns the path over every node except `skip`.
+    """
+    parent = list(range(n))
+
+    def find(a):
+        while parent[a] != a:
+            parent[a] = parent[parent[a]]
+            a = parent[a]
+        return a
+
+    degree = [0] * n
+    adj = [[] for _ in range(n)]
+    need = n - 1 - (skip is not None)
+    taken = 0
+    for u, v in zip(us, vs):
+        if taken == need:
+            break
+        if degree[u] >= 2 or degree[v] >= 2:
+            continue
+        ru, rv = find(u), find(v)
+        if ru == rv:
+            continue
+        parent[ru] = rv
+        adj[u].append(v)
+        adj[v].append(u)
+        degree[u] += 1
+        degree[v] += 1
+        taken += 1
+
+    start = next(k for k in range(n) if k != skip and degree[k] <= 1)
+    path = [start]
+    prev = -1
+    while True:
+        nxt = [k for k in adj[path[-1]] if k != prev]
+        if not nxt:
+            return path
+        prev = path[-1]
+        path.append(nxt[0])
+
+
+def christofides(dist):
+    """Christofides-style tour.
+
+    The odd-degree nodes of the spanning tree are paired by a greedy
+    matching refined with pair exchanges rather than an exact minimum
+    weight matching (which costs O(k^3) on k odd nodes and dominated the
+    construction); the tour is polished by local search afterwards anyway.
+    """
+    n = len(dist)
+    if n < 3:
+        return list(range(n))
+    edges = _minimum_spanning_tree(dist)
+    degree = np.zeros(n, dtype=np.int64)
+    for u, v in edges:
+        degree[u] += 1
+        degree[v] += 1
+    odd = np.flatnonzero(degree % 2).tolist()
+    edges.extend(_matching(dist, odd))
+
+    # Hierholzer over the tree plus matching (a connected multigraph with
+    # even degrees), skipping nodes already visited
+    adj = [[] for _ in range(n)]
+    for e, (u, v) in enumerate(edges):
+        adj[u].append((v, e))
+        adj[v].append((u, e))
+    used = [False] * len(edges)
+    stack = [0]
+    seen = [False] * n
+    tour = []
+    while stack:
+        u = stack[-1]
+        while adj[u] and used[adj[u][-1][1]]:
+            adj[u].pop()
+        if adj[u]:
+            v, e = adj[u].pop()
+            used[e] = True
+            stack.append(v)
+        else:
+            stack.pop()
+            if not seen[u]:
+                seen[u] = True
+                tour.append(u)
+    tour.reverse()
+    return tour
+
+
+def _minimum_spanning_tree(dist):
+    """Prim's algorithm on the dense matrix; returns [(u, v)] tree edges."""
+    n = len(dist)
+    in_tree = np.zeros(n, dtype=bool)
+    in_tree[0] = True
+    best = np.array(dist[0], dtype=float)
+    link = np.zeros(n, dtype=np.intp)
+    edges = []
+    for _ in range(n - 1):
+        v = int(np.argmin(np.where(in_tree, np.inf, best)))
+        edges.append((int(link[v]), v))
+        in_tree[v] = True
+        closer = dist[v] < best
+        best[closer] = dist[v][closer]
+        link[closer] = v
+    return edges
+
+
+def _matching(dist, nodes):
+    """Pair up `nodes` (an even count): greedy by distance, then pair exchanges.
+
+    Two pairs (a, b), (c, d) are rewired to (a, c), (b, d) or (a, d), (b, c)
+    whenever that's shorter, until no exchange helps.
+    """
+    nodes = np.asarray(nodes, dtype=np.intp)
+    k = len(nodes)
+    if k == 0:
+        return []
+    sub = dist[np.ix_(nodes, nodes)]
+    i, j = np.triu_indices(k, 1)
+    mate = [-1] * k
+    for a, b in zip(*(x[np.argsort(sub[i, j], kind="stable")].tolist() for x in (i, j))):
+        if mate[a] < 0 and mate[b] < 0:
+            mate[a] = b
+            mate[b] = a
+
+    pairs = [(a, mate[a]) for a in range(k) if a < mate[a]]
+    rows = sub.tolist()
+    eps = 1e-9
+    improved = True
+    while improved:
+        improved = False
+        for p in range(len(pairs)):
+            a, b = pairs[p]
+            for q in range(p + 1, len(pairs)):
+                c, d = pairs[q]
+                now = rows[a][b] + rows[c][d]
+                if rows[a][c] + rows[b][d] < now - eps:
+                    pairs[p], pairs[q] = (a, c), (b, d)
+                elif rows[a][d] + rows[b][c] < now - eps:
+                    pairs[p], pairs[q] = (a, d), (b, c)
+                else:
+                    continue
+                a, b = pairs[p]
+                improved = True
+    return [(int(nodes[a]), int(nodes[b])) for a, b in pairs]
@@ -6,8 +6,37 @@ import re
 from datetime import datetime, timedelta, date, time
 import random
 import heapq
+import hashlib
+import math
+import time as _time
+import multiprocessing
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import matplotlib.image
 import networkx as nx
-from networkx.algorithms.approximation import traveling_salesman_problem
+import numpy as np
+
+from array_graph import ArrayGraph
+from graph_reduction import (
+    Chain,
+    contract_nodes,
+    find_chains,
+    splice_at_anchor,
+    splice_chains,
+    tie_chain_ends,
+)
+from journey_planner import ConnectionScan
+from local_search import MOVE_KINDS, double_bridge, first_improvement, neighbor_lists
+from map_layers import BaseLayer, encode_png, render_base_layer, render_overlay, trim_margins
+from shortest_paths import DistanceMatrix
+from timetable_index import (
+    LineTimetable,
+    TimetableCache,
+    SERVICE_CALENDARS,
+    service_day_for_date,
+    timetables_for_service_day,
+)
+from tour_construction import CONSTRUCTIONS, construct_tour, open_tour
 
 # implement all translation maps
 FILE_PATH = "datasets/secondary.json"
@@ -53,6 +82,13 @@ LINE_COLORS = {
     "Bike": "#00FF00",
 }
 
+# Legs per TimingCache entry and default number of cached blocks
+TIMING_BLOCK_LEGS = 16
+TIMING_CACHE_SIZE = 20000
+
+# Default --time-limit (seconds) for --optimizer runs
+DEFAULT_OPTIMIZER_SECONDS = 60
+
 # World record stored as a timedelta (single source of truth)
 WORLD_RECORD_DELTA = timedelta(hours=13, minutes=53, seconds=25)
 # Derived minutes for comparisons (used as default threshold)
@@ -139,26 +175,119 @@ RAW_VENDING_STATIONS = {
 
 
 def sweep_start_times(route, graph, secondary, timetables, from_dt, to_dt, step_minutes=15,
-                      transfer_buffer_minutes=2, use_congestion=True, hub_extra_minutes=None):
+                      transfer_buffer_minutes=2, use_congestion=True, hub_extra_minutes=None,
+                      paths=None, cache=None):
     """Retime a fixed route over a grid of start datetimes and return the best timed result.
 
+    Every start is timed at once with `start_time_profile()`; only the
+    best one is then timed in full. `paths` (a DistanceMatrix for `graph`)
+    and `cache` (a TimingCache) are forwarded for that.
+
     Returns tuple (best_total_minutes, best_start_dt, best_timed) or (None, None, None)
     """
-    results = []
+    starts = []
     t = from_dt
     while t <= to_dt:
-        timed = compute_timed_route(route, graph, secondary, timetables, t,
-                                    transfer_buffer_minutes=transfer_buffer_minutes,
-                                    use_congestion=use_congestion,
-                                    hub_extra_minutes=hub_extra_minutes)
-        total = total_minutes_from_timed(timed)
-        if total is not None:
-            results.append((total, t, timed))
+        starts.append(t)
         t = t + timedelta(minutes=step_minutes)
-    if not results:
+    if not starts or not route:
         return None, None, None
-    results.sort(key=lambda x: x[0])
-    return results[0]
+    totals = start_time_profile(route, graph, secondary, timetables, starts,
+                                transfer_buffer_minutes=transfer_buffer_minutes,
+                                use_congestion=use_congestion,
+                                hub_extra_minutes=hub_extra_minutes,
+                                paths=paths)
+    best = int(np.argmin(totals))  # first of equal totals, like a stable sort
+    best_start_dt = starts[best]
+    best_timed = compute_timed_route(route, graph, secondary, timetables, best_start_dt,
+                                     transfer_buffer_minutes=transfer_buffer_minutes,
+                                     use_congestion=use_congestion,
+                                     hub_extra_minutes=hub_extra_minutes,
+                                     paths=paths, cache=cache)
+    return int(totals[best]), best_start_dt, best_timed
+
+
+def start_time_profile(route, graph, secondary, timetables, start_dts,
+                       transfer_buffer_minutes=2, use_congestion=True, hub_extra_minutes=None,
+                       paths=None):
+    """Total minutes of `route` for every start in `start_dts`, in one pass.
+
+    Carries an array of arrival times through the route: each leg maps all
+    ready times to departures and arrivals at once (`LineTimetable.next_trips`,
+    a `searchsorted` over the compiled departures), applying the same
+    buffers, fallbacks and boarding rules as `compute_timed_route()`. Times
+    are kept as integer microseconds, so the totals match it exactly.
+
+    Returns an int64 array aligned with `start_dts`.
+    """
+    expanded = [route[0]]
+    _expand_legs(route, 0, len(route) - 2, expanded, [0], graph, paths)
+
+    midnight = datetime.combine(start_dts[0].date(), time(0, 0))
+    arrival = np.array([_microseconds(dt - midnight) for dt in start_dts], dtype=np.int64)
+    first_depart = arrival
+    prev_line = None
+    for i in range(len(expanded) - 1):
+        u = expanded[i]
+        v = expanded[i + 1]
+        is_uturn = i > 0 and expanded[i - 1] == v
+        edge, line, tt_file, from_norm, to_norm = _leg_lookup(u, v, graph, secondary, timetables)
+        is_transfer = bool(prev_line and line != prev_line)
+
+        earliest = arrival
+        if is_transfer:
+            # buffers only depend on the hour of arrival
+            buffers = np.array([
+                _microseconds(timedelta(minutes=get_transfer_buffer(
+                    u, time(h, 0), base_minutes=transfer_buffer_minutes,
+                    use_congestion=use_congestion, hub_extra_minutes=hub_extra_minutes)))
+                for h in range(24)
+            ], dtype=np.int64)
+            earliest = arrival + buffers[(arrival // _US_PER_HOUR) % 24]
+
+        found = np.zeros(len(arrival), dtype=bool)
+        depart = earliest
+        arrive = earliest
+        trips = timetables.get(tt_file, []) if tt_file else []
+        if trips:
+            line_tt = _as_line_timetable(trips)
+            # query each start relative to the midnight of its own day
+            day = earliest // _US_PER_DAY * _US_PER_DAY
+            dep_min, arr_min = line_tt.next_trips(
+                from_norm, to_norm, (earliest - day) / _US_PER_MINUTE,
+            )
+            found = ~np.isnan(dep_min)
+            depart = np.where(found, day + np.nan_to_num(dep_min).astype(np.int64) * _US_PER_MINUTE, earliest)
+            arrive = np.where(found, day + np.nan_to_num(arr_min).astype(np.int64) * _US_PER_MINUTE, earliest)
+
+        # fallback to edge weight (minutes)
+        weight_us = _microseconds(timedelta(minutes=_edge_minutes(edge)))
+        arrive = np.where(found, arrive, earliest + weight_us)
+
+        # minimum boarding time for transfers or U-turns
+        if is_transfer or is_uturn:
+            min_needed = arrival + _US_PER_MINUTE
+            push = (depart <= arrival) | (depart < min_needed)
+            pushed = np.maximum(depart, min_needed)
+            travel = np.where(found, arrive - depart, weight_us)
+            arrive = np.where(push, pushed + travel, arrive)
+            depart = np.where(push, pushed, depart)
+
+        if i == 0:
+            first_depart = depart
+        arrival = arrive
+        prev_line = line
+
+    return (arrival - first_depart) // _US_PER_MINUTE
+
+
+_US_PER_MINUTE = 60 * 1000 * 1000
+_US_PER_HOUR = 60 * _US_PER_MINUTE
+_US_PER_DAY = 24 * _US_PER_HOUR
+
+
+def _microseconds(td):
+    return td // timedelta(microseconds=1)
 
 
 def get_terminal_nodes(graph, secondary):
@@ -300,114 +429,206 @@ def get_board_departure_time(leg_idx, edge_lines, trip_ids, depart_times, arriva
 
     return board_depart
 
-def visualize_route(graph, route, positions):
-    import matplotlib.pyplot as plt
+# Schematic background and output geometry for visualize_route
+ROUTE_MAP_IMAGE = "datasets/9859zh-202305_number_en.png"
+ROUTE_MAP_EXTENT = (0, 2500, 0, 1600)
+ROUTE_MAP_FIGSIZE = (16, 12)
+ROUTE_MAP_DPI = 150
+# Rasterized base layers (schematic + grey graph) are cached here between runs
+ROUTE_MAP_CACHE_DIR = os.path.join("datasets", ".cache")
 
-    # ensure any previous figures are closed so the viewer shows the fresh image
-    plt.close("all")
-    fig = plt.figure(figsize=(16, 12))
+_route_base_layers = {}
 
-    # Load and display the schematic map image
-    img = plt.imread("datasets/9859zh-202305_number_en.png")
-    xmin, xmax = 0, 2500
-    ymin, ymax = 0, 1600
-    plt.imshow(img, extent=[xmin, xmax, ymin, ymax], zorder=0)
 
-    # Set axis limits to match image
-    plt.xlim(xmin, xmax)
-    plt.ylim(ymin, ymax)
+def _route_base_layer_key(graph, positions):
+    """Hash everything the static route-map background depends on."""
+    h = hashlib.sha256()
+    try:
+        st = os.stat(ROUTE_MAP_IMAGE)
+        h.update(repr((st.st_mtime_ns, st.st_size)).encode())
+    except OSError:
+        pass
+    h.update(repr((ROUTE_MAP_EXTENT, ROUTE_MAP_FIGSIZE, ROUTE_MAP_DPI)).encode())
+    h.update(repr(sorted(tuple(sorted(e)) for e in graph.edges())).encode())
+    h.update(repr(sorted((n, positions.get(n)) for n in graph.nodes())).encode())
+    return h.hexdigest()[:16]
 
-    # Remove axes and whitespace
-    plt.axis("off")
-    plt.tight_layout(pad=0)
 
-    # Draw the full graph with transparency
-    nx.draw(
-        graph,
-        pos=positions,
-        node_size=30,
-        edge_color="lightgray",
-        with_labels=False,
-        alpha=0.1,
-    )
+def get_route_base_layer(graph, positions):
+    """Return the rasterized schematic + faded full graph used under every route.
 
-    # Highlight the route with line colors
-    route_edges = list(zip(route, route[1:]))
-    edge_colors = []
-    for u, v in route_edges:
-        edge = graph.get_edge_data(u, v)
-        line = edge.get("color", "Unknown") if edge else "Unknown"
-        if isinstance(line, str) and line.startswith("jreast-"):
-            color_key = "JR"
-        else:
-            color_key = line
-        edge_colors.append(LINE_COLORS.get(color_key, "#cccccc"))
+    Rendered once per distinct graph/positions/image and reused from memory
+    or from `ROUTE_MAP_CACHE_DIR`, so the 2500x1600 schematic is only decoded
+    and the ~400 grey edges only drawn when something changed.
+    """
+    key = _route_base_layer_key(graph, positions)
+    layer = _route_base_layers.get(key)
+    if layer is not None:
+        return layer
+
+    prefix = os.path.join(ROUTE_MAP_CACHE_DIR, f"route_base_{key}")
+    layer = BaseLayer.load(prefix)
+    if layer is None:
+        xmin, xmax, ymin, ymax = ROUTE_MAP_EXTENT
+
+        def draw(fig, ax):
+            # Load and display the schematic map image
+            img = matplotlib.image.imread(ROUTE_MAP_IMAGE)
+            ax.imshow(img, extent=[xmin, xmax, ymin, ymax], zorder=0)
+
+            # Set axis limits to match image
+            ax.set_xlim(xmin, xmax)
+            ax.set_ylim(ymin, ymax)
+
+            # Remove axes and whitespace
+            ax.axis("off")
+            fig.tight_layout(pad=0)
+
+            # Draw the full graph with transparency
+            nx.draw(
+                graph,
+                pos=positions,
+                ax=ax,
+                node_size=30,
+                edge_color="lightgray",
+                with_labels=False,
+                alpha=0.1,
+            )
+            ax.set_title("Optimized Tokyo Metro Route (Schematic)")
 
-    nx.draw_networkx_nodes(
-        graph, pos=positions, nodelist=route, node_color="red", node_size=80, alpha=0.1
-    )
-    nx.draw_networkx_edges(
-        graph,
-        pos=positions,
-        edgelist=route_edges,
-        edge_color=edge_colors,
-        width=3,
-        alpha=0.8,
-    )
+        layer = render_base_layer(draw, figsize=ROUTE_MAP_FIGSIZE, dpi=ROUTE_MAP_DPI)
+        try:
+            os.makedirs(ROUTE_MAP_CACHE_DIR, exist_ok=True)
+            layer.save(prefix)
+        except OSError:
+            pass
+    _route_base_layers[key] = layer
+    return layer
 
-    # Mark U-turns and transfers
-    for idx in range(1, len(route) - 1):
-        prev_station = route[idx - 1]
-        curr_station = route[idx]
-        next_station = route[idx + 1]
-        curr_line = LETTER_TO_LINE.get(curr_station[0], "Unknown Line")
-        next_line = LETTER_TO_LINE.get(next_station[0], "Unknown Line")
-        is_transfer = curr_line != next_line
-        is_uturn = prev_station == next_station
-        if is_transfer or is_uturn:
-            x, y = positions.get(curr_station, (None, None))
-            if x is not None and y is not None:
-                plt.scatter(
-                    x,
-                    y,
-                    c="cyan" if is_transfer else "orange",
-                    s=200,
-                    marker="*",
-                    zorder=10,
-                    alpha=0.6,
-                )
-                plt.text(
-                    x,
-                    y,
-                    "T" if is_transfer else "U",
-                    fontsize=14,
-                    color="black",
-                    ha="center",
-                    va="center",
-                    alpha=1.0,
-                )
 
-    # Label start/end
-    start, end = route[0], route[-1]
-    nx.draw_networkx_labels(
-        graph,
-        positions,
-        labels={start: "Start", end: "End"},
-        font_color="blue",
-        alpha=0.9,
-    )
-    plt.title("Optimized Tokyo Metro Route (Schematic)")
+def visualize_route(graph, route, positions):
+    """Render `route` over the cached base map, save it and display it."""
+    base = get_route_base_layer(graph, positions)
+
+    def draw(fig, ax):
+        # Highlight the route with line colors
+        route_edges = list(zip(route, route[1:]))
+        edge_colors = []
+        for u, v in route_edges:
+            edge = graph.get_edge_data(u, v)
+            line = edge.get("color", "Unknown") if edge else "Unknown"
+            if isinstance(line, str) and line.startswith("jreast-"):
+                color_key = "JR"
+            else:
+                color_key = line
+            edge_colors.append(LINE_COLORS.get(color_key, "#cccccc"))
+
+        nx.draw_networkx_nodes(
+            graph, pos=positions, ax=ax, nodelist=route, node_color="red", node_size=80, alpha=0.1
+        )
+        nx.draw_networkx_edges(
+            graph,
+            pos=positions,
+            ax=ax,
+            edgelist=route_edges,
+            edge_color=edge_colors,
+            width=3,
+            alpha=0.8,
+        )
+
+        # Mark U-turns and transfers
+        for idx in range(1, len(route) - 1):
+            prev_station = route[idx - 1]
+            curr_station = route[idx]
+            next_station = route[idx + 1]
+            curr_line = LETTER_TO_LINE.get(curr_station[0], "Unknown Line")
+            next_line = LETTER_TO_LINE.get(next_station[0], "Unknown Line")
+            is_transfer = curr_line != next_line
+            is_uturn = prev_station == next_station
+            if is_transfer or is_uturn:
+                x, y = positions.get(curr_station, (None, None))
+                if x is not None and y is not None:
+                    ax.scatter(
+                        x,
+                        y,
+                        c="cyan" if is_transfer else "orange",
+                        s=200,
+                        marker="*",
+                        zorder=10,
+                        alpha=0.6,
+                    )
+                    ax.text(
+                        x,
+                        y,
+                        "T" if is_transfer else "U",
+                        fontsize=14,
+                        color="black",
+                        ha="center",
+                        va="center",
+                        alpha=1.0,
+                    )
+
+        # Label start/end
+        start, end = route[0], route[-1]
+        nx.draw_networkx_labels(
+            graph,
+            positions,
+            labels={start: "Start", end: "End"},
+            font_color="blue",
+            alpha=0.9,
+            ax=ax,
+        )
+
+    # crop like savefig(bbox_inches="tight"), which pads by 0.1 inch
+    rgba = trim_margins(render_overlay(base, draw), pad=int(0.1 * ROUTE_MAP_DPI))
+
     # save a copy so external viewers can load the latest render
     try:
         out_path = os.path.join("datasets", "last_route.png")
-        fig.savefig(out_path, dpi=150, bbox_inches="tight")
+        with open(out_path, "wb") as f:
+            f.write(encode_png(rgba, dpi=ROUTE_MAP_DPI))
     except Exception:
         pass
+
+    import matplotlib.pyplot as plt
+
+    # ensure any previous figures are closed so the viewer shows the fresh image
+    plt.close("all")
+    fig = plt.figure(figsize=ROUTE_MAP_FIGSIZE)
+    ax = fig.add_axes([0, 0, 1, 1])
+    ax.imshow(rgba)
+    ax.axis("off")
     plt.show()
     plt.close(fig)
 
 
-def simulate_grand_tour(graph, secondary, unique_nodes=None, start_node=None, rng=None):
+def _tsp_path_from_matrix(paths, nodes, construction="christofides", chains=()):
+    """Open TSP path over `nodes` using distances from a DistanceMatrix.
+
+    Like networkx's `traveling_salesman_problem(cycle=False)`, a closed tour
+    is built (see tour_construction), the heaviest tour edge is dropped to
+    open it and each remaining hop is expanded to its shortest path, but the
+    metric closure is just the matrix's rows and columns for `nodes`.
+    `nodes` may hold contracted `chains` (graph_reduction.contract_nodes);
+    their ends are kept adjacent and the full runs spliced back in.
+    """
+    idx = [paths.index[n] for n in nodes]
+    dist = paths.dist[np.ix_(idx, idx)]
+    if chains:
+        tie_chain_ends(dist, nodes, chains)
+    order = [nodes[k] for k in open_tour(construct_tour(dist, construction), dist)]
+    if chains:
+        order = splice_chains(order, chains)
+
+    route = []
+    for u, v in zip(order, order[1:]):
+        route.extend(paths.path(u, v)[:-1])
+    route.append(order[-1])
+    return route
+
+
+def simulate_grand_tour(graph, secondary, unique_nodes=None, start_node=None, rng=None, paths=None,
+                        construction="christofides", chains=None):
     """
     Simulate a grand tour of the Tokyo Metro starting from a given station.
     Accepts an optional precomputed `unique_nodes` list so callers can cache
@@ -417,14 +638,29 @@ def simulate_grand_tour(graph, secondary, unique_nodes=None, start_node=None, rn
     :param unique_nodes: Optional precomputed list of nodes to pass to the TSP solver
     :param start_node: Optional node code to anchor the route start.
     :param rng: Optional random.Random instance for reproducible random starts.
+    :param paths: Optional DistanceMatrix for `graph` (e.g. with perturbed
+        weights); computed from `graph` when omitted.
+    :param construction: Tour constructor, one of tour_construction.CONSTRUCTIONS.
+    :param chains: Optional graph_reduction Chains (see find_chains); the TSP
+        then only sees each chain's end stations and walks it in full.
     :return: A list of stations in the tour.
     """
     if unique_nodes is None:
         unique_nodes = get_unique_station_nodes(graph, secondary)
-    route = traveling_salesman_problem(
-        graph, cycle=False, weight="weight", nodes=unique_nodes
-    )
+    if paths is None:
+        paths = DistanceMatrix.from_graph(graph)
+    if chains:
+        unique_nodes = contract_nodes(unique_nodes, chains)
+    route = _tsp_path_from_matrix(paths, unique_nodes, construction, chains)
+    return anchor_tour(route, start_node, rng)
 
+
+def anchor_tour(route, start_node=None, rng=None):
+    """Rotate (and maybe reverse) a TSP path so it starts at `start_node`.
+
+    Without a start node, `rng` picks a random rotation instead. Either
+    way `rng` (a random.Random) may flip the traversal direction.
+    """
     # If a forced start node was provided, rotate to it
     if start_node and start_node in route:
         idx = route.index(start_node)
@@ -677,17 +913,31 @@ def apply_refill_stops(route_nodes, secondary, stop_interval_stations=25, includ
     return stops, total_seconds
 
 
-def load_timetables(timetables_dir="datasets/timetables"):
+def load_timetables(timetables_dir="datasets/timetables", use_cache=True):
     """Load all timetable JSON files into structured objects.
 
-    Returns a dict: filename -> list of trips where each trip contains:
+    Returns a dict: filename -> LineTimetable built from the file's trips,
+    where each trip is parsed into:
       - id: trip id
       - station_idx: {norm_station: index}
       - station_time: {norm_station: "HH:MM"}
+
+    Each LineTimetable compiles a sorted departure index per
+    (from_station, to_station) pair on first use (see timetable_index).
+
+    With `use_cache`, compiled timetables are memory-mapped from
+    `<timetables_dir>/.cache` and a file's JSON is only re-parsed when its
+    mtime or size changed since the cache entry was written.
     """
     timetables = {}
+    cache = TimetableCache(os.path.join(timetables_dir, ".cache")) if use_cache else None
     files = glob.glob(os.path.join(timetables_dir, "*.json"))
     for fp in files:
+        if cache is not None:
+            cached = cache.load(fp)
+            if cached is not None:
+                timetables[os.path.basename(fp)] = cached
+                continue
         try:
             with open(fp, "r") as f:
                 data = json.load(f)
@@ -719,10 +969,30 @@ def load_timetables(timetables_dir="datasets/timetables"):
                     "station_idx": station_idx,
                     "station_time": station_time,
                 })
-        timetables[os.path.basename(fp)] = trips
+        line_tt = LineTimetable.from_trips(trips)
+        if cache is not None:
+            cache.store(fp, line_tt)
+        timetables[os.path.basename(fp)] = line_tt
     return timetables
 
 
+def build_journey_planner(graph, secondary, timetables, change_minutes=2):
+    """Build a ConnectionScan planner over `timetables` for `graph`'s stations.
+
+    Stops are `_norm()`ed station names. Edges whose line has no timetable
+    file (in-station transfers, walks, buses, bikes) become fixed links
+    taking their weight in minutes (see ConnectionScan.add_links).
+    """
+    planner = ConnectionScan(timetables, change_minutes=change_minutes)
+    station_of = {node: _norm(secondary.get(node)) for node in graph.nodes()}
+    links = [
+        (u, v, data) for u, v, data in graph.edges(data=True)
+        if not _find_timetable_file_for_line(data.get("color"), timetables)
+    ]
+    planner.add_links(links, station_of, names=secondary)
+    return planner
+
+
 def _find_timetable_file_for_line(line_name: str, timetables: dict):
     """Find a timetable filename key that matches the given line name.
     Uses substring matching against filenames.
@@ -745,105 +1015,269 @@ def _parse_time_with_date(time_str: str, base_date: date):
         return None
 
 
+def _minutes_since_midnight(dt: datetime, midnight: datetime) -> float:
+    return (dt - midnight).total_seconds() / 60.0
+
+
+def _as_line_timetable(timetable_trips):
+    if isinstance(timetable_trips, LineTimetable):
+        return timetable_trips
+    return LineTimetable.from_trips(list(timetable_trips))
+
+
 def find_next_trip_for_segment(timetable_trips, from_norm, to_norm, earliest_dt):
+    """Return (depart_dt, arrive_dt, trip_id) of the earliest-arriving trip
+    leaving `from_norm` for `to_norm` within 24 hours of `earliest_dt`.
+
+    Uses the compiled per-segment index of the LineTimetable (a bisect plus
+    a bounded scan). The next-day fallback is only attempted when
+    `earliest_dt.hour >= 23` (legacy behavior), so callers that run shortly
+    after midnight do not automatically get a next-day candidate.
+    """
     if not timetable_trips:
         return None, None, None
-    base_date = earliest_dt.date()
-
-    candidates = []
-    for trip in timetable_trips:
-        sidx = trip.get("station_idx", {})
-        stime = trip.get("station_time", {})
-        if from_norm in sidx and to_norm in sidx and sidx[from_norm] < sidx[to_norm]:
-            dep_str = stime.get(from_norm)
-            arr_str = stime.get(to_norm)
-            if not dep_str or not arr_str:
-                continue
-            dep_dt = _parse_time_with_date(dep_str, base_date)
-            arr_dt = _parse_time_with_date(arr_str, base_date)
-            if not dep_dt or not arr_dt:
-                continue
-            if arr_dt < dep_dt:
-                arr_dt += timedelta(days=1)
-            candidates.append((dep_dt, arr_dt, trip.get("id")))
-
-    candidates.sort(key=lambda x: x[0])
-
-    # *** FIX: cap lookahead to 24 hours ***
-    # Note: the next-day fallback below is only attempted when the caller's
-    # `earliest_dt.hour >= 23` (legacy behavior). This means callers that run
-    # shortly after midnight may not automatically get a next-day candidate;
-    # callers that rely on early-morning cross-midnight searches should take
-    # this into account or perform an explicit next-day lookup.
-    max_wait = earliest_dt + timedelta(hours=24)
-    after = [
-        (dep, arr, tid) for (dep, arr, tid) in candidates
-        if dep >= earliest_dt and dep <= max_wait   # <-- add the cap
-    ]
-    if after:
-        best = min(after, key=lambda x: x[1])
-        return best
-
-    # No same-day departure — try next-day (also capped)
-    if earliest_dt.hour >= 23:
-        next_day = [
-            (dep + timedelta(days=1), arr + timedelta(days=1), tid)
-            for (dep, arr, tid) in candidates
-            if (dep + timedelta(days=1)) >= earliest_dt
-               and (dep + timedelta(days=1)) <= max_wait  # <-- cap here too
-        ]
-        if next_day:
-            best = min(next_day, key=lambda x: x[1])
-            return best
-
-    return None, None, None
+    line_tt = _as_line_timetable(timetable_trips)
+    midnight = datetime.combine(earliest_dt.date(), time(0, 0))
+    earliest_min = _minutes_since_midnight(earliest_dt, midnight)
+    dep_min, arr_min, tid = line_tt.next_trip(from_norm, to_norm, earliest_min)
+    if dep_min is None:
+        return None, None, None
+    return (
+        midnight + timedelta(minutes=dep_min),
+        midnight + timedelta(minutes=arr_min),
+        tid,
+    )
 
 
 def find_first_departure_from_station(timetable_trips, from_norm, cutoff_dt):
     """Return the first departure datetime from `from_norm` on or after `cutoff_dt`.
 
-    Returns (depart_dt, trip_id) or (None, None).
+    Returns (depart_dt, trip_id) or (None, None). If nothing departs after
+    the cutoff, the earliest known departure of that day is returned
+    (it's probably just before cutoff, e.g. a 03:45 train; caller will handle).
     """
     if not timetable_trips:
         return None, None
-    base_date = cutoff_dt.date()
-    candidates = []
-    for trip in timetable_trips:
-        stime = trip.get("station_time", {})
-        if from_norm in stime:
-            dep_str = stime.get(from_norm)
-            if not dep_str:
-                continue
-            dep_dt = _parse_time_with_date(dep_str, base_date)
-            if not dep_dt:
-                continue
-            candidates.append((dep_dt, trip.get("id")))
+    line_tt = _as_line_timetable(timetable_trips)
+    midnight = datetime.combine(cutoff_dt.date(), time(0, 0))
+    dep_min, tid = line_tt.first_departure(from_norm, _minutes_since_midnight(cutoff_dt, midnight))
+    if dep_min is None:
+        return None, None
+    return midnight + timedelta(minutes=dep_min), tid
+
+
+def _expand_leg(u, v, graph, paths=None):
+    """Return the nodes after `u` on the way to `v` (just [v] for a direct edge)."""
+    try:
+        if graph.has_edge(u, v):
+            return [v]
+        if paths is not None:
+            path = paths.path(u, v) or [v]
+        else:
+            path = nx.shortest_path(graph, u, v, weight="weight")
+        if len(path) >= 2:
+            return path[1:]
+        return [v]
+    except Exception:
+        # If shortest path fails for some reason, fall back
+        return [v]
+
+
+def _expand_legs(route, lo, hi, expanded, positions, graph, paths=None, leg_cache=None):
+    """Append the expansion of legs route[lo]->route[lo+1] .. route[hi]->route[hi+1]."""
+    for k in range(lo, hi + 1):
+        key = (route[k], route[k + 1])
+        if leg_cache is not None and key in leg_cache:
+            leg = leg_cache[key]
+        else:
+            leg = _expand_leg(route[k], route[k + 1], graph, paths)
+            if leg_cache is not None:
+                leg_cache[key] = leg
+        expanded.extend(leg)
+        positions.append(len(expanded) - 1)
+
+
+def _edge_data(graph, u, v):
+    edge = graph.get_edge_data(u, v)
+    # edge can sometimes be a dict of dicts for MultiGraph; try to normalize
+    if isinstance(edge, dict) and "color" not in edge and edge:
+        # pick the first nested dict
+        first = next(iter(edge.values()))
+        edge = first if isinstance(first, dict) else edge
+    return edge
+
+
+def intern_timetable_ids(graph, secondary, timetables):
+    """Resolve an ArrayGraph's stations and lines against `timetables` once.
+
+    Stations are keyed by `_norm()`ed name and lines by the timetable file
+    `_find_timetable_file_for_line` picks, so timing legs on the returned
+    graph skips both (see `_leg_lookup`). Filenames are the same in every
+    service-day view of `timetables`, so one resolution serves all of them.
+    """
+    station_of = {node: _norm(secondary.get(node, None)) for node in graph.nodes()}
+    return graph.intern_timetables(
+        station_of, lambda line: _find_timetable_file_for_line(line, timetables)
+    )
+
+
+def _leg_lookup(u, v, graph, secondary, timetables):
+    """Return (edge, line, tt_file, from_norm, to_norm) for timing edge u -> v.
+
+    Uses the integer ids of an interned ArrayGraph when available, else
+    normalizes the station names and matches the line to a timetable file.
+    """
+    if getattr(graph, "line_table", None) is not None:
+        e, table, a, b = graph.leg_ids(u, v)
+        edge = graph.edge_attrs(e) if e is not None else None
+        line = edge.get("color") if edge else None
+        tt_file = graph.tables[table] if table >= 0 else None
+        return edge, line, tt_file, graph.stations[a], graph.stations[b]
+    edge = _edge_data(graph, u, v)
+    line = edge.get("color") if edge else None
+    tt_file = _find_timetable_file_for_line(line, timetables)
+    if not tt_file:
+        return edge, line, None, None, None
+    return edge, line, tt_file, _norm(secondary.get(u, None)), _norm(secondary.get(v, None))
+
+
+def _edge_minutes(edge):
+    # use edge weight (minutes) if available
+    weight = None
+    if edge:
+        weight = edge.get("weight") or edge.get("real_distance")
+    try:
+        return float(weight) if weight is not None else 3.0
+    except Exception:
+        return 3.0
+
+
+def _time_leg(u, v, prev_station, prev_line, arrival, graph, secondary, timetables, start_dt,
+              transfer_buffer_minutes=2, use_congestion=True, hub_extra_minutes=None):
+    """Time one edge of an expanded route.
+
+    `arrival` is the arrival datetime at `u`, `prev_line` the line of the
+    previous edge and `prev_station` the node before `u` (for U-turns).
+
+    Returns (line, trip_id, depart_dt, arrive_dt).
+    """
+    is_uturn = prev_station == v
+    edge, line, tt_file, from_norm, to_norm = _leg_lookup(u, v, graph, secondary, timetables)
+    tid = None
+
+    # earliest possible departure is arrival at u,
+    # plus transfer buffer if changing lines (congestion-aware)
+    earliest = arrival
+    if earliest is None:
+        earliest = start_dt
+    if prev_line and line != prev_line:
+        buf = get_transfer_buffer(u, earliest, base_minutes=transfer_buffer_minutes,
+                                  use_congestion=use_congestion, hub_extra_minutes=hub_extra_minutes)
+        earliest = earliest + timedelta(minutes=buf)
+
+    depart_dt = None
+    arrive_dt = None
+
+    # try timetable-based lookup
+    if tt_file:
+        trips = timetables.get(tt_file, [])
+        dep_dt, arr_dt, tid = find_next_trip_for_segment(trips, from_norm, to_norm, earliest)
+        if dep_dt and arr_dt:
+            depart_dt = dep_dt
+            arrive_dt = arr_dt
+
+    # fallback to edge weight (minutes)
+    if depart_dt is None or arrive_dt is None:
+        minutes = _edge_minutes(edge)
+        depart_dt = earliest
+        arrive_dt = depart_dt + timedelta(minutes=minutes)
+
+    # enforce a minimum boarding time for transfers or U-turns to avoid zero-minute
+    min_boarding = timedelta(minutes=1)
+    if (prev_line and line != prev_line) or is_uturn:
+        if arrival:
+            min_needed = arrival + min_boarding
+            # if the scheduled departure is before min_needed, push forward
+            if depart_dt <= arrival or depart_dt < min_needed:
+                # if this leg was timetable-based, preserve travel duration
+                if tt_file and dep_dt and arr_dt:
+                    travel_dur = arrive_dt - depart_dt
+                    depart_dt = max(depart_dt, min_needed)
+                    arrive_dt = depart_dt + travel_dur
+                else:
+                    # fallback: use the edge-estimated minutes
+                    depart_dt = max(depart_dt, min_needed)
+                    arrive_dt = depart_dt + timedelta(minutes=minutes)
+
+    return line, tid, depart_dt, arrive_dt
+
 
-    candidates.sort(key=lambda x: x[0])
-    for dep_dt, tid in candidates:
-        if dep_dt >= cutoff_dt:
-            return dep_dt, tid
-    # No departure found after cutoff — return the earliest known departure
-    # (it's probably just before cutoff, e.g. a 03:45 train; caller will handle)
-    if candidates:
-        dep_dt, tid = candidates[0]
-        return dep_dt, tid  # don't add a day
-    return None, None
+class TimingCache:
+    """LRU cache of timed route blocks shared by `compute_timed_route` calls.
+
+    Keys are a block of TIMING_BLOCK_LEGS expanded legs together with the
+    state the block is entered with (previous station, previous line,
+    arrival datetime) and the buffer settings; values are the block's
+    lines, trip ids, departures and arrivals. Timing a block only depends
+    on that key, so repeated start-time sweeps, re-timed trial routes and
+    starts that catch the same train reuse each other's work.
+
+    A cache is only valid for one graph and one set of timetables.
+    """
+
+    def __init__(self, maxsize=TIMING_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups if lookups else 0.0
+        return f"{self.hits} hits, {self.misses} misses ({rate:.0%} hit rate), {len(self)} blocks cached"
 
 
 def compute_timed_route(route, graph, secondary, timetables, start_dt,
-                        transfer_buffer_minutes=2, use_congestion=True, hub_extra_minutes=None):
+                        transfer_buffer_minutes=2, use_congestion=True, hub_extra_minutes=None,
+                        paths=None, cache=None):
     """Compute depart/arrival datetimes for each node along the route.
 
+    `timetables` should already be narrowed to the trial date's service
+    calendar (see `timetables_for_service_day`). `paths` is an optional
+    DistanceMatrix for `graph` used to expand non-adjacent legs, and
+    `cache` an optional TimingCache for this graph and timetables.
+
     Returns dict with keys:
+      - route: the expanded route (consecutive nodes are adjacent)
+      - route_positions: index in `route` of each node of the input route
       - depart_times: list length len(route)-1 (departure from node i to i+1)
       - arrival_times: list length len(route) (arrival at node i)
       - edge_lines: list length len(route)-1 (line used for each edge)
+      - trip_ids: list length len(route)-1
     """
     # If route is empty, return empty timed structure
     if not route:
         return {
             "route": [],
+            "route_positions": [],
             "depart_times": [],
             "arrival_times": [],
             "edge_lines": [],
@@ -855,21 +1289,8 @@ def compute_timed_route(route, graph, secondary, timetables, start_dt,
     # ensures intermediate stations (like Ayase) that appear on the
     # path are accounted for in timing and visit order.
     expanded = [route[0]]
-    for i in range(len(route) - 1):
-        u = route[i]
-        v = route[i + 1]
-        try:
-            if graph.has_edge(u, v):
-                expanded.append(v)
-            else:
-                path = nx.shortest_path(graph, u, v, weight="weight")
-                if len(path) >= 2:
-                    expanded.extend(path[1:])
-                else:
-                    expanded.append(v)
-        except Exception:
-            # If shortest path fails for some reason, fall back
-            expanded.append(v)
+    positions = [0]
+    _expand_legs(route, 0, len(route) - 2, expanded, positions, graph, paths)
 
     # Use the expanded route for timing computations
     route = expanded
@@ -880,86 +1301,130 @@ def compute_timed_route(route, graph, secondary, timetables, start_dt,
 
     arrival_times[0] = start_dt
     prev_line = None
-    base_date = start_dt.date()
-
-    for i in range(len(route) - 1):
-        u = route[i]
-        v = route[i + 1]
-        prev_station = route[i - 1] if i - 1 >= 0 else None
-        is_uturn = prev_station == v
-        edge = graph.get_edge_data(u, v)
-        # edge can sometimes be a dict of dicts for MultiGraph; try to normalize
-        if isinstance(edge, dict) and "color" not in edge and edge:
-            # pick the first nested dict
-            first = next(iter(edge.values()))
-            edge = first if isinstance(first, dict) else edge
+    settings = (transfer_buffer_minutes, use_congestion, hub_extra_minutes)
+
+    # Time the legs in blocks; with a cache, a block whose nodes and entry
+    # state (previous station and line, arrival time) were seen before is
+    # copied instead of re-queried
+    block = TIMING_BLOCK_LEGS if cache is not None else max(1, len(route) - 1)
+    for a in range(0, len(route) - 1, block):
+        b = min(a + block, len(route) - 1)
+        key = None
+        if cache is not None:
+            key = (route[a - 1] if a else None, tuple(route[a:b + 1]), prev_line, arrival_times[a], settings)
+            hit = cache.get(key)
+            if hit is not None:
+                edge_lines[a:b], trip_ids[a:b], depart_times[a:b], arrival_times[a + 1:b + 1] = hit
+                prev_line = edge_lines[b - 1]
+                continue
 
-        line = edge.get("color") if edge else None
-        edge_lines[i] = line
-
-        # earliest possible departure is arrival at u,
-        # plus transfer buffer if changing lines (congestion-aware)
-        earliest = arrival_times[i]
-        if earliest is None:
-            earliest = start_dt
-        if prev_line and line != prev_line:
-            buf = get_transfer_buffer(u, earliest, base_minutes=transfer_buffer_minutes,
-                                      use_congestion=use_congestion, hub_extra_minutes=hub_extra_minutes)
-            earliest = earliest + timedelta(minutes=buf)
-
-        depart_dt = None
-        arrive_dt = None
-
-        # try timetable-based lookup
-        tt_file = _find_timetable_file_for_line(line, timetables)
-        if tt_file:
-            trips = timetables.get(tt_file, [])
-            from_name = secondary.get(u, None)
-            to_name = secondary.get(v, None)
-            from_norm = _norm(from_name)
-            to_norm = _norm(to_name)
-            dep_dt, arr_dt, tid = find_next_trip_for_segment(trips, from_norm, to_norm, earliest)
-            if dep_dt and arr_dt:
-                depart_dt = dep_dt
-                arrive_dt = arr_dt
+        for i in range(a, b):
+            prev_station = route[i - 1] if i - 1 >= 0 else None
+            line, tid, depart_dt, arrive_dt = _time_leg(
+                route[i], route[i + 1], prev_station, prev_line, arrival_times[i],
+                graph, secondary, timetables, start_dt,
+                transfer_buffer_minutes=transfer_buffer_minutes,
+                use_congestion=use_congestion,
+                hub_extra_minutes=hub_extra_minutes,
+            )
+            edge_lines[i] = line
             trip_ids[i] = tid
+            depart_times[i] = depart_dt
+            arrival_times[i + 1] = arrive_dt
+            prev_line = line
+
+        if key is not None:
+            cache.put(key, (
+                edge_lines[a:b],
+                trip_ids[a:b],
+                depart_times[a:b],
+                arrival_times[a + 1:b + 1],
+            ))
 
-        # fallback to edge weight (minutes)
-        if depart_dt is None or arrive_dt is None:
-            # use edge weight (minutes) if available
-            weight = None
-            if edge:
-                weight = edge.get("weight") or edge.get("real_distance")
-            try:
-                minutes = float(weight) if weight is not None else 3.0
-            except Exception:
-                minutes = 3.0
-            depart_dt = earliest
-            arrive_dt = depart_dt + timedelta(minutes=minutes)
-
-        # enforce a minimum boarding time for transfers or U-turns to avoid zero-minute
-        min_boarding = timedelta(minutes=1)
-        if (prev_line and line != prev_line) or is_uturn:
-            if arrival_times[i]:
-                min_needed = arrival_times[i] + min_boarding
-                # if the scheduled departure is before min_needed, push forward
-                if depart_dt <= arrival_times[i] or depart_dt < min_needed:
-                    # if this leg was timetable-based, preserve travel duration
-                    if tt_file and dep_dt and arr_dt:
-                        travel_dur = arrive_dt - depart_dt
-                        depart_dt = max(depart_dt, min_needed)
-                        arrive_dt = depart_dt + travel_dur
-                    else:
-                        # fallback: use the edge-estimated minutes
-                        depart_dt = max(depart_dt, min_needed)
-                        arrive_dt = depart_dt + timedelta(minutes=minutes)
+    return {
+        "route": route,
+        "route_positions": positions,
+        "depart_times": depart_times,
+        "arrival_times": arrival_times,
+        "edge_lines": edge_lines,
+        "trip_ids": trip_ids,
+    }
 
-        depart_times[i] = depart_dt
-        arrival_times[i + 1] = arrive_dt
+
+def retime_route(timed, route, lo, hi, graph, secondary, timetables, start_dt,
+                 transfer_buffer_minutes=2, use_congestion=True, hub_extra_minutes=None,
+                 paths=None, leg_cache=None):
+    """Incrementally time `route`, a same-length edit of the route behind `timed`.
+
+    `route` must match the old route at every index <= `lo` and > `hi`
+    (e.g. a two-opt reversal of route[lo+1:hi+1]). The timing of the
+    unchanged prefix is reused, legs are re-timed from route[lo] on, and
+    as soon as the timing state inside the unchanged tail (arrival time,
+    previous line and previous station) matches the old one, the rest of
+    the old timing is copied instead of recomputed.
+
+    `timed` must come from `compute_timed_route` or `retime_route` with the
+    same graph, timetables, start and buffer settings. `leg_cache` is an
+    optional dict memoizing leg expansions across calls.
+
+    Returns the same structure as `compute_timed_route`, with identical
+    values.
+    """
+    old_route = timed["route"]
+    old_positions = timed["route_positions"]
+    old_depart = timed["depart_times"]
+    old_arrival = timed["arrival_times"]
+    old_lines = timed["edge_lines"]
+    old_trips = timed["trip_ids"]
+    hi = min(hi, len(route) - 2)
+
+    # expanded route: old prefix, re-expanded window, old tail
+    e_lo = old_positions[lo]
+    expanded = old_route[:e_lo + 1]
+    positions = old_positions[:lo + 1]
+    _expand_legs(route, lo, hi, expanded, positions, graph, paths, leg_cache)
+    tail_start = len(expanded) - 1
+    shift = tail_start - old_positions[hi + 1]
+    expanded.extend(old_route[old_positions[hi + 1] + 1:])
+    positions.extend(p + shift for p in old_positions[hi + 2:])
+
+    depart_times = old_depart[:e_lo]
+    arrival_times = old_arrival[:e_lo + 1]
+    edge_lines = old_lines[:e_lo]
+    trip_ids = old_trips[:e_lo]
+    prev_line = edge_lines[-1] if edge_lines else None
+
+    for m in range(e_lo, len(expanded) - 1):
+        prev_station = expanded[m - 1] if m - 1 >= 0 else None
+        if m >= tail_start and m > e_lo:
+            old_m = m - shift
+            if (
+                arrival_times[m] == old_arrival[old_m]
+                and prev_line == old_lines[old_m - 1]
+                and prev_station == old_route[old_m - 1]
+            ):
+                # same state on the same remaining nodes: the rest is unchanged
+                depart_times.extend(old_depart[old_m:])
+                arrival_times.extend(old_arrival[old_m + 1:])
+                edge_lines.extend(old_lines[old_m:])
+                trip_ids.extend(old_trips[old_m:])
+                break
+        line, tid, depart_dt, arrive_dt = _time_leg(
+            expanded[m], expanded[m + 1], prev_station, prev_line, arrival_times[m],
+            graph, secondary, timetables, start_dt,
+            transfer_buffer_minutes=transfer_buffer_minutes,
+            use_congestion=use_congestion,
+            hub_extra_minutes=hub_extra_minutes,
+        )
+        edge_lines.append(line)
+        trip_ids.append(tid)
+        depart_times.append(depart_dt)
+        arrival_times.append(arrive_dt)
         prev_line = line
 
     return {
-        "route": route,
+        "route": expanded,
+        "route_positions": positions,
         "depart_times": depart_times,
         "arrival_times": arrival_times,
         "edge_lines": edge_lines,
@@ -967,24 +1432,22 @@ def compute_timed_route(route, graph, secondary, timetables, start_dt,
     }
 
 
-def perturb_graph_weights(graph, noise, rng=None):
-    """Return a copy of graph with edge 'weight' perturbed by up to +/- noise fraction.
+def perturbed_edge_weights(graph, noise, rng=None):
+    """Return an ArrayGraph's edge weights perturbed by up to +/- noise fraction.
 
-    `rng` should be an instance of random.Random for reproducibility.
+    The result is a new float array aligned with `graph.weights`; the graph
+    itself is shared, so a trial allocates nothing else. Pass it to
+    `DistanceMatrix.reweighted(graph, weights=...)`.
     """
     if rng is None:
         rng = random.Random()
-    G = graph.copy()
-    for u, v, data in G.edges(data=True):
-        w = data.get("weight") if data.get("weight") is not None else data.get("real_distance")
-        try:
-            w = float(w) if w is not None else 3.0
-        except Exception:
-            w = 3.0
-        factor = 1.0 + rng.uniform(-noise, noise)
-        new_w = max(0.1, w * factor)
-        data["weight"] = new_w
-    return G
+    # one draw per edge, in edge order
+    factors = np.fromiter(
+        (1.0 + rng.uniform(-noise, noise) for _ in range(len(graph.weights))),
+        dtype=np.float64, count=len(graph.weights),
+    )
+    factors *= graph.weights
+    return np.maximum(0.1, factors, out=factors)
 
 
 def total_minutes_from_timed(timed):
@@ -1006,41 +1469,45 @@ def total_minutes_from_timed(timed):
 
 
 def two_opt(route, graph, secondary, timetables, start_dt, max_iters=200, rng=None,
-            transfer_buffer_minutes=2, use_congestion=True, hub_extra_minutes=None):
+            transfer_buffer_minutes=2, use_congestion=True, hub_extra_minutes=None,
+            paths=None, cache=None):
     """Perform a two-opt local search guided by static shortest-path weights.
 
     For correctness with congestion-aware timing, `transfer_buffer_minutes`,
     `use_congestion`, and `hub_extra_minutes` are forwarded to
-    `compute_timed_route()` when evaluating candidates.
+    `compute_timed_route()` when evaluating candidates. Candidates are
+    timed incrementally with `retime_route()` from the current solution's
+    timing, so only the reversed stretch (and whatever it delays) is
+    re-queried against the timetables.
+
+    `paths` is the DistanceMatrix for `graph`; it is built here when not
+    supplied, but callers running many trials should compute it once.
+    `cache` is an optional TimingCache used for the initial full timing.
     """
     if rng is None:
         rng = random.Random()
-
-    dist_cache = {}
-
-    def dist(u, v):
-        key = (u, v)
-        if key in dist_cache:
-            return dist_cache[key]
-        try:
-            d = nx.shortest_path_length(graph, u, v, weight="weight")
-        except Exception:
-            d = float("inf")
-        dist_cache[key] = d
-        return d
+    if paths is None:
+        paths = DistanceMatrix.from_graph(graph)
+    dist = paths.distance
 
     n = len(route)
     if n < 4:
         return route, compute_timed_route(route, graph, secondary, timetables, start_dt,
                                           transfer_buffer_minutes=transfer_buffer_minutes,
                                           use_congestion=use_congestion,
-                                          hub_extra_minutes=hub_extra_minutes)
+                                          hub_extra_minutes=hub_extra_minutes,
+                                          paths=paths, cache=cache)
 
     current_timed = compute_timed_route(route, graph, secondary, timetables, start_dt,
                                         transfer_buffer_minutes=transfer_buffer_minutes,
                                         use_congestion=use_congestion,
-                                        hub_extra_minutes=hub_extra_minutes)
+                                        hub_extra_minutes=hub_extra_minutes,
+                                        paths=paths, cache=cache)
     current_total = total_minutes_from_timed(current_timed) or float("inf")
+    # leg expansions are the same in every candidate, so share them
+    leg_cache = {}
+    # accepted swaps never touch the Oedo block, so its span is fixed
+    oedo = get_oedo_block(route)
 
     iters = 0
     improved = True
@@ -1057,20 +1524,21 @@ def two_opt(route, graph, secondary, timetables, start_dt, max_iters=200, rng=No
             if any(x == float("inf") for x in (wAB, wCD, wAC, wBD)):
                 continue
             # Guard: skip any swap that overlaps the Oedo (E*) block
-            oedo_indices = [k for k, n in enumerate(route) if isinstance(n, str) and n.startswith("E")]
-            if oedo_indices:
-                oedo_start = oedo_indices[0]
-                oedo_end = oedo_indices[-1]
+            if oedo is not None:
+                oedo_start, oedo_end = oedo
                 # Skip if either swap endpoint falls inside or straddles the Oedo block
                 if not (j < oedo_start or i > oedo_end):
                     continue
 
             if wAC + wBD + 1e-6 < wAB + wCD:
                 candidate = route[:i + 1] + list(reversed(route[i + 1:j + 1])) + route[j + 1:]
-                timed_candidate = compute_timed_route(candidate, graph, secondary, timetables, start_dt,
-                                                      transfer_buffer_minutes=transfer_buffer_minutes,
-                                                      use_congestion=use_congestion,
-                                                      hub_extra_minutes=hub_extra_minutes)
+                # only legs i..j changed; reuse the current timing around them
+                timed_candidate = retime_route(current_timed, candidate, i, j,
+                                               graph, secondary, timetables, start_dt,
+                                               transfer_buffer_minutes=transfer_buffer_minutes,
+                                               use_congestion=use_congestion,
+                                               hub_extra_minutes=hub_extra_minutes,
+                                               paths=paths, leg_cache=leg_cache)
                 total_candidate = total_minutes_from_timed(timed_candidate)
                 if total_candidate is not None and total_candidate < current_total:
                     route = candidate
@@ -1084,6 +1552,135 @@ def two_opt(route, graph, secondary, timetables, start_dt, max_iters=200, rng=No
     return route, current_timed
 
 
+def sweep_local_search(route, graph, secondary, timetables, start_dt, max_iters=200,
+                       transfer_buffer_minutes=2, use_congestion=True, hub_extra_minutes=None,
+                       paths=None, moves=MOVE_KINDS, neighbors=8, timed=None, nearest=None,
+                       cache=None):
+    """Deterministic first-improvement local search (see local_search.py).
+
+    Tries two-opt, Or-opt and segment-swap `moves` that connect each node
+    to one of its `neighbors` nearest route nodes, screens them by their
+    change in static distance and validates the improving ones against the
+    timed objective with `retime_route()`. Runs at most `max_iters` passes
+    over the route; the Oedo block is left untouched like in `two_opt`.
+    `timed` is the route's current timing, if already computed, and
+    `nearest` the route's neighbor lists (they only depend on its node set).
+    `cache` is an optional TimingCache used when timing the route in full.
+
+    Returns (route, timed) like `two_opt`.
+    """
+    if paths is None:
+        paths = DistanceMatrix.from_graph(graph)
+    timing = dict(
+        transfer_buffer_minutes=transfer_buffer_minutes,
+        use_congestion=use_congestion,
+        hub_extra_minutes=hub_extra_minutes,
+        paths=paths,
+    )
+    leg_cache = {}
+
+    def evaluate(timed, candidate, lo, hi):
+        if lo is None:
+            timed = compute_timed_route(candidate, graph, secondary, timetables, start_dt,
+                                        cache=cache, **timing)
+        else:
+            timed = retime_route(timed, candidate, lo, hi, graph, secondary, timetables, start_dt,
+                                 leg_cache=leg_cache, **timing)
+        return total_minutes_from_timed(timed), timed
+
+    if len(route) < 4:
+        return route, evaluate(None, route, None, None)[1]
+
+    if nearest is None:
+        nearest = neighbor_lists(paths, route, k=neighbors)
+    total = total_minutes_from_timed(timed) if timed is not None else None
+    route, timed, _total, _passes = first_improvement(
+        route, timed, evaluate, paths, nearest, kinds=moves,
+        frozen=get_oedo_block(route), max_passes=max_iters, total=total,
+    )
+    return route, timed
+
+
+def iterated_local_search(route, timed, graph, secondary, timetables, start_dt, rng,
+                          mode="ils", time_limit=None, max_kicks=None,
+                          temperature=10.0, cooling=0.995, max_iters=200,
+                          transfer_buffer_minutes=2, use_congestion=True, hub_extra_minutes=None,
+                          paths=None, moves=MOVE_KINDS, neighbors=8, verbose=False):
+    """Improve a timed route with repeated double-bridge kicks plus local search.
+
+    Each kick (`local_search.double_bridge`, clear of the Oedo block) is
+    followed by `sweep_local_search()`. With `mode="ils"` the result
+    replaces the current tour when it's no slower; with `mode="anneal"` a
+    slower one is also accepted with probability exp(-delta / T), where T
+    starts at `temperature` minutes and is multiplied by `cooling` after
+    every kick. The best tour seen is kept.
+
+    Stops after `time_limit` seconds or `max_kicks` kicks, whichever comes
+    first. The search only depends on `rng` and the kick count, so a run
+    stopped by the clock after N kicks is reproduced by max_kicks=N.
+
+    Returns (best_route, best_timed, kicks).
+    """
+    if paths is None:
+        paths = DistanceMatrix.from_graph(graph)
+    timing = dict(
+        transfer_buffer_minutes=transfer_buffer_minutes,
+        use_congestion=use_congestion,
+        hub_extra_minutes=hub_extra_minutes,
+        paths=paths,
+    )
+    deadline = _time.monotonic() + time_limit if time_limit is not None else None
+    frozen = get_oedo_block(route)
+    # kicks only reorder the route, so its neighbor lists never change
+    nearest = neighbor_lists(paths, route, k=neighbors)
+    leg_cache = {}
+
+    current_route, current_timed = route, timed
+    current_total = total_minutes_from_timed(timed)
+    if current_total is None:
+        current_total = float("inf")
+    best_route, best_timed, best_total = current_route, current_timed, current_total
+    kicks = 0
+    while max_kicks is None or kicks < max_kicks:
+        if deadline is not None and _time.monotonic() >= deadline:
+            break
+        move = double_bridge(current_route, rng, frozen=frozen)
+        if move is None:
+            break
+        kicks += 1
+        kicked = move.apply(current_route)
+        kicked_timed = retime_route(current_timed, kicked, move.lo, move.hi,
+                                    graph, secondary, timetables, start_dt,
+                                    leg_cache=leg_cache, **timing)
+        new_route, new_timed = sweep_local_search(
+            kicked, graph, secondary, timetables, start_dt, max_iters=max_iters,
+            moves=moves, timed=kicked_timed, nearest=nearest, **timing,
+        )
+        new_total = total_minutes_from_timed(new_timed)
+        if new_total is None:
+            continue
+        delta = new_total - current_total
+        accept = delta <= 0
+        if not accept and mode == "anneal" and temperature > 0:
+            accept = rng.random() < math.exp(-delta / temperature)
+        temperature *= cooling
+        if accept:
+            current_route, current_timed, current_total = new_route, new_timed, new_total
+        if new_total < best_total:
+            best_route, best_timed, best_total = new_route, new_timed, new_total
+            if verbose:
+                print(f"{mode}: kick {kicks} improved to {best_total // 60}h {best_total % 60}m")
+    return best_route, best_timed, kicks
+
+
+def get_oedo_block(route):
+    """Return (first, last) indexes of Oedo (E*) nodes in `route`, or None."""
+    oedo_indices = [k for k, n in enumerate(route) if isinstance(n, str) and n.startswith("E")]
+    if not oedo_indices:
+        return None
+    return oedo_indices[0], oedo_indices[-1]
+
+
 def load_graph(verbose=False, disable_bus=False):
     graph = nx.read_graphml("datasets/tokyometro.graphml")
 
@@ -1134,6 +1731,331 @@ def get_unique_station_nodes(graph, secondary):
     return unique_nodes
 
 
+def _trial_base_tour(trial_seed, env):
+    """Unanchored TSP path over the perturbed distances for `trial_seed`.
+
+    Returns (route, oedo_anchor, routing rng state, optimizer seed); the
+    route is not yet rotated to a start node (see `anchor_tour`). None of
+    it depends on the start node, so the last result is kept in
+    env["base_tour"] and trials repeating a seed with other starts (sweep
+    mode's terminals) only re-anchor it.
+    """
+    cached = env.get("base_tour")
+    if cached is not None and cached[0] == trial_seed:
+        return cached[1]
+    graph = env["graph"]
+    noise = env["noise"]
+    base_paths = env["base_paths"]
+
+    trial_rng = random.Random(trial_seed)
+    perturb_rng = random.Random(trial_rng.randint(0, 2**31 - 1))
+    routing_rng = random.Random(trial_rng.randint(0, 2**31 - 1))
+    optimizer_seed = trial_rng.randint(0, 2**31 - 1)
+    del trial_rng  # prevent accidental reuse
+
+    # perturb edge weights for search only; the graph itself is shared
+    if noise > 0:
+        pert_weights = perturbed_edge_weights(graph, noise, perturb_rng)
+        pert_paths = base_paths.reweighted(graph, weights=pert_weights)
+    else:
+        pert_paths = base_paths
+
+    # compute candidate route from perturbed graph
+    # Shuffle the precomputed unique node list per-trial so the
+    # TSP heuristic explores different node orderings each run.
+    shuffled_nodes = env["unique_nodes"][:]
+    try:
+        routing_rng.shuffle(shuffled_nodes)
+    except Exception:
+        # Fallback: use Python's random.shuffle if Random.shuffle isn't available
+        random.shuffle(shuffled_nodes)
+
+    # Remove Oedo nodes from the TSP and represent Oedo as a single anchor (E28).
+    non_oedo_nodes = [n for n in shuffled_nodes if not (isinstance(n, str) and n.startswith("E"))]
+    oedo_anchor = "E28" if "E28" in graph.nodes() else next((n for n in shuffled_nodes if isinstance(n, str) and n.startswith("E")), None)
+    tsp_nodes = non_oedo_nodes + ([oedo_anchor] if oedo_anchor else [])
+
+    route = simulate_grand_tour(
+        graph,
+        env["secondary"],
+        unique_nodes=tsp_nodes,
+        paths=pert_paths,
+        construction=env["construction"],
+        chains=env["chains"],
+    )
+    result = (route, oedo_anchor, routing_rng.getstate(), optimizer_seed)
+    env["base_tour"] = (trial_seed, result)
+    return result
+
+
+def run_trial(trial_seed, start_node, env):
+    """
+    One randomized trial: perturb the graph, build a tour, refine it with
+    two-opt and time it (optionally sweeping start times).
+
+    The result depends only on `trial_seed`, `start_node` and the shared
+    `env` built by main, so trials can run in any order or process.
+
+    With an `optimizer` in env the refined tour is then improved further by
+    `iterated_local_search()`, with its own seed drawn from `trial_seed`
+    after the perturbation and routing seeds.
+
+    Returns a dict with the unrefined `candidate_route`, the refined
+    `route`, its `timed` result, `start_dt`, `total_min` (None if the
+    route couldn't be timed) and the number of optimizer `kicks` (None
+    without an optimizer).
+    """
+    graph = env["graph"]
+    secondary = env["secondary"]
+    timetables = env["timetables"]
+    base_paths = env["base_paths"]
+    parsed_start_dt = env["parsed_start_dt"]
+    cutoff_dt = datetime.combine(env["base_trial_date"], time(4, 0))
+    no_two_opt = env["no_two_opt"]
+    two_opt_iters = env["two_opt_iters"]
+    sweep_window = env["sweep_window"]
+    transfer_buffer_minutes = env["transfer_buffer_minutes"]
+    use_congestion = env["use_congestion"]
+    hub_extra_minutes = env["hub_extra_minutes"]
+    timing_cache = env["timing_cache"]
+
+    base_route, oedo_anchor, rng_state, optimizer_seed = _trial_base_tour(trial_seed, env)
+    routing_rng = random.Random()
+    routing_rng.setstate(rng_state)
+    candidate_route = anchor_tour(base_route, start_node, routing_rng)
+    # Splice the full Oedo subpath into the candidate where the anchor appears
+    # (like a contracted chain, but after anchoring so the block stays whole)
+    if candidate_route and oedo_anchor:
+        oedo = Chain(get_oedo_subpath(graph), line="Oedo", anchor=oedo_anchor)
+        candidate_route = splice_at_anchor(candidate_route, oedo)
+
+    # determine start_dt for this candidate
+    if parsed_start_dt and parsed_start_dt >= cutoff_dt:
+        candidate_start_dt = parsed_start_dt
+    else:
+        first_node = candidate_route[0]
+        start_line_name = LETTER_TO_LINE.get(first_node[0], "")
+        tt_file = _find_timetable_file_for_line(start_line_name, timetables)
+        if tt_file:
+            trips = timetables.get(tt_file, [])
+            from_name = secondary.get(first_node, None)
+            from_norm = _norm(from_name)
+            dep_dt, tripid = find_first_departure_from_station(trips, from_norm, cutoff_dt)
+            candidate_start_dt = dep_dt if dep_dt else cutoff_dt
+        else:
+            candidate_start_dt = cutoff_dt
+
+    # refine with two-opt (validated against timed objective)
+    if not no_two_opt:
+        try:
+            if env["local_search"] == "sweep":
+                refined_route, refined_timed = sweep_local_search(
+                    candidate_route, graph, secondary, timetables,
+                    candidate_start_dt, max_iters=two_opt_iters,
+                    transfer_buffer_minutes=transfer_buffer_minutes,
+                    use_congestion=use_congestion,
+                    hub_extra_minutes=hub_extra_minutes,
+                    paths=base_paths,
+                    cache=timing_cache,
+                    moves=env["moves"],
+                    neighbors=env["neighbors"],
+                )
+            else:
+                refined_route, refined_timed = two_opt(
+                    candidate_route, graph, secondary, timetables,
+                    candidate_start_dt, max_iters=two_opt_iters, rng=routing_rng,
+                    transfer_buffer_minutes=transfer_buffer_minutes,
+                    use_congestion=use_congestion,
+                    hub_extra_minutes=hub_extra_minutes,
+                    paths=base_paths,
+                    cache=timing_cache,
+                )
+        except Exception:
+            refined_route = candidate_route
+            refined_timed = compute_timed_route(
+                candidate_route, graph, secondary, timetables, candidate_start_dt,
+                transfer_buffer_minutes=transfer_buffer_minutes,
+                use_congestion=use_congestion,
+                hub_extra_minutes=hub_extra_minutes,
+                paths=base_paths,
+                cache=timing_cache,
+            )
+    else:
+        refined_route = candidate_route
+        refined_timed = compute_timed_route(
+            candidate_route, graph, secondary, timetables, candidate_start_dt,
+            transfer_buffer_minutes=transfer_buffer_minutes,
+            use_congestion=use_congestion,
+            hub_extra_minutes=hub_extra_minutes,
+            paths=base_paths,
+            cache=timing_cache,
+        )
+
+    # two-opt refinement complete. Oedo continuity is enforced
+    # by injecting the full Oedo subpath before two-opt, so no
+    # additional fragmentation warnings are necessary here.
+
+    # Optionally keep improving this tour with kicks + local search
+    kicks = None
+    if env["optimizer"]:
+        refined_route, refined_timed, kicks = iterated_local_search(
+            refined_route, refined_timed, graph, secondary, timetables, candidate_start_dt,
+            random.Random(optimizer_seed),
+            mode=env["optimizer"],
+            time_limit=env["time_limit"],
+            max_kicks=env["max_kicks"],
+            max_iters=two_opt_iters,
+            transfer_buffer_minutes=transfer_buffer_minutes,
+            use_congestion=use_congestion,
+            hub_extra_minutes=hub_extra_minutes,
+            paths=base_paths,
+            moves=env["moves"],
+            neighbors=env["neighbors"],
+            verbose=env["verbose"],
+        )
+
+    # Optionally sweep start times for this fixed route to find the best start
+    if sweep_window is not None:
+        from_dt, to_dt, step = sweep_window
+        best_total, best_start_dt, best_timed = sweep_start_times(
+            refined_route, graph, secondary, timetables, from_dt, to_dt, step,
+            transfer_buffer_minutes=transfer_buffer_minutes,
+            use_congestion=use_congestion,
+            hub_extra_minutes=hub_extra_minutes,
+            paths=base_paths,
+            cache=timing_cache,
+        )
+        if best_total is not None:
+            refined_timed = best_timed
+            candidate_start_dt = best_start_dt
+
+    total_min = total_minutes_from_timed(refined_timed)  # ✅ always defined
+
+    return {
+        "candidate_route": candidate_route,
+        "route": refined_route,
+        "timed": refined_timed,
+        "start_dt": candidate_start_dt,
+        "total_min": total_min,
+        "kicks": kicks,
+    }
+
+
+# shared trial inputs of a worker process, set once by _init_trial_worker
+_TRIAL_ENV = None
+
+
+def _init_trial_worker(env):
+    global _TRIAL_ENV
+    _TRIAL_ENV = env
+
+
+def _run_trial_job(trial_seed, start_node):
+    return run_trial(trial_seed, start_node, _TRIAL_ENV)
+
+
+def run_trials_parallel(jobs, env, workers):
+    """
+    Runs (t, trial_seed, start_node) jobs on a pool of `workers` processes
+    and yields (t, trial_seed, start_node, result) in job order, the same
+    sequence a serial run produces: a trial finishing early is held back
+    until every job before it has been yielded, so stopping at the first
+    acceptable result stops at the same trial either way.
+
+    The shared env is handed to each worker once at startup (inherited
+    without copying where fork is available) and only `workers * 2` jobs
+    are running at a time, so `jobs` may be long or lazily generated.
+    Closing the generator cancels trials that haven't started.
+    """
+    if "fork" in multiprocessing.get_all_start_methods():
+        mp_context = multiprocessing.get_context("fork")
+    else:
+        mp_context = None
+    jobs = iter(jobs)
+    pool = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=mp_context,
+        initializer=_init_trial_worker,
+        initargs=(env,),
+    )
+    # (future, job) in submission order; `running` holds the futures not
+    # yet seen to finish, which keep a worker slot taken
+    queued = deque()
+    running = set()
+
+    def submit_next():
+        job = next(jobs, None)
+        if job is not None:
+            t, trial_seed, start_node = job
+            future = pool.submit(_run_trial_job, trial_seed, start_node)
+            queued.append((future, job))
+            running.add(future)
+
+    try:
+        for _ in range(workers * 2):
+            submit_next()
+        while queued:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                running.discard(future)
+                submit_next()
+            # release the finished trials at the front of the queue
+            while queued and queued[0][0].done():
+                future, (t, trial_seed, start_node) = queued.popleft()
+                yield t, trial_seed, start_node, future.result()
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _repro_flags(args, candidate=None):
+    """CLI flags besides the seed and date that change a trial's result."""
+    flags = ""
+    if getattr(args, "optimizer", None):
+        flags += f" --optimizer {args.optimizer}"
+        if candidate is not None and candidate.get("kicks") is not None:
+            flags += f" --max-kicks {candidate['kicks']}"
+    if getattr(args, "service_day", None):
+        flags += f" --service-day {args.service_day}"
+    if getattr(args, "construction", "christofides") != "christofides":
+        flags += f" --construction {args.construction}"
+    if getattr(args, "no_chain_contraction", False):
+        flags += " --no-chain-contraction"
+    if getattr(args, "sweep_terminals", False) and candidate is not None and candidate.get("start_node"):
+        flags += f" --start-station {candidate['start_node']}"
+    if getattr(args, "local_search", "two-opt") != "two-opt" or getattr(args, "optimizer", None):
+        if args.local_search != "two-opt":
+            flags += f" --local-search {args.local_search}"
+        if args.moves != ",".join(MOVE_KINDS):
+            flags += f" --moves {args.moves}"
+        if args.neighbors != 8:
+            flags += f" --neighbors {args.neighbors}"
+    return flags
+
+
+def _candidate_rank(candidate):
+    return candidate["total_min"], candidate["trial"]
+
+
+def _keep_candidate(heap, candidate, k):
+    """Keep `candidate` in `heap` if it's among the k best seen so far.
+
+    `heap` holds (negated rank, candidate) entries with the worst kept
+    candidate on top, so memory stays at k full routes however many
+    trials run. Read it back with `_ranked_candidates`.
+    """
+    total, trial = _candidate_rank(candidate)
+    entry = (-total, -trial, candidate)
+    if len(heap) < k:
+        heapq.heappush(heap, entry)
+    elif entry[:2] > heap[0][:2]:
+        heapq.heapreplace(heap, entry)
+
+
+def _ranked_candidates(heap):
+    """The candidates kept by `_keep_candidate`, best first."""
+    return [entry[2] for entry in sorted(heap, key=lambda e: e[:2], reverse=True)]
+
+
 def main(args):
 
     with open(FILE_PATH, "r") as file:
@@ -1175,9 +2097,19 @@ def main(args):
         return
 
     # load timetables
-    timetables = load_timetables()
+    timetables = load_timetables(use_cache=not getattr(args, "no_timetable_cache", False))
     # Precompute the unique station nodes once and reuse across trials (TSP node set)
     unique_nodes = get_unique_station_nodes(graph, secondary)
+    # All-pairs shortest paths on the unperturbed graph, shared by every trial
+    base_paths = DistanceMatrix.from_graph(graph)
+    # Same-line runs between junctions, walked whole; Oedo is handled
+    # separately (see get_oedo_subpath)
+    chains = []
+    if not getattr(args, "no_chain_contraction", False):
+        chains = find_chains(graph, skip=[n for n in graph.nodes() if isinstance(n, str) and n.startswith("E")])
+        if args.verbose:
+            members = sum(len(c) for c in chains)
+            print(f"Contracted {len(chains)} same-line chains ({members} stations) for the TSP")
 
     # Optional forced start station (node code or station name)
     forced_start_node = None
@@ -1235,6 +2167,11 @@ def main(args):
     top_k = int(getattr(args, "top_k", 3))
     two_opt_iters = int(getattr(args, "two_opt_iters", 200))
     no_two_opt = getattr(args, "no_two_opt", False)
+    moves = tuple(m.strip().replace("-", "_") for m in getattr(args, "moves", ",".join(MOVE_KINDS)).split(",") if m.strip())
+    unknown_moves = [m for m in moves if m not in MOVE_KINDS]
+    if unknown_moves:
+        print(f"Ignoring unknown --moves: {', '.join(unknown_moves)}")
+        moves = tuple(m for m in moves if m in MOVE_KINDS)
 
     # Endless-mode options
     endless_mode = getattr(args, "endless", False)
@@ -1271,6 +2208,7 @@ def main(args):
     transfer_buffer_minutes = float(getattr(args, "transfer_buffer", 2))
     hub_extra_minutes = float(getattr(args, "hub_extra", HUB_EXTRA_MINUTES))
 
+    # the top_k best candidates, worst on top (see _keep_candidate)
     candidates = []
 
     trial_date_arg = getattr(args, "trial_date", None)
@@ -1283,6 +2221,61 @@ def main(args):
     else:
         base_trial_date = date.today()
 
+    # Only consult trips that run on the trial date's service calendar
+    service_day = getattr(args, "service_day", None) or service_day_for_date(base_trial_date)
+    timetables = timetables_for_service_day(timetables, service_day)
+    if args.verbose:
+        print(f"Using {service_day} timetables for {base_trial_date.isoformat()}")
+
+    # Optional start-time sweep window, the same for every trial
+    sweep_window = None
+    if getattr(args, "sweep_starts", False):
+        cutoff_dt = datetime.combine(base_trial_date, time(4, 0))
+        sf = getattr(args, "sweep_start_from", "04:00")
+        st = getattr(args, "sweep_start_to", "10:00")
+        step = int(getattr(args, "sweep_start_step", 15))
+        from_dt = _parse_time_with_date(sf, base_trial_date)
+        to_dt = _parse_time_with_date(st, base_trial_date)
+        if from_dt is None:
+            from_dt = cutoff_dt
+        if to_dt is None:
+            to_dt = datetime.combine(base_trial_date, time(10, 0))
+        if from_dt < cutoff_dt:
+            from_dt = cutoff_dt
+        if to_dt < from_dt:
+            to_dt = from_dt
+        sweep_window = (from_dt, to_dt, step)
+
+    # Parallel trial workers (0 = one per CPU)
+    workers = int(getattr(args, "workers", 1))
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    if replay_seed is not None:
+        workers = 1
+
+    # Timed route blocks shared by every trial (and start sweep) in this process
+    timing_cache_size = int(getattr(args, "timing_cache_size", TIMING_CACHE_SIZE))
+    timing_cache = TimingCache(timing_cache_size) if timing_cache_size > 0 else None
+
+    # Optimizer mode: each trial is one kick + local search chain
+    optimizer = getattr(args, "optimizer", None)
+    time_limit = getattr(args, "time_limit", None)
+    max_kicks = getattr(args, "max_kicks", None)
+    if optimizer:
+        if endless_mode:
+            print("Warning: --optimizer is incompatible with --endless; ignoring --endless.")
+            endless_mode = False
+        if getattr(args, "sweep_terminals", False):
+            print("Warning: --optimizer is incompatible with --sweep-terminals; ignoring --sweep-terminals.")
+            args.sweep_terminals = False
+        if time_limit is None and max_kicks is None:
+            time_limit = DEFAULT_OPTIMIZER_SECONDS
+        if replay_seed is None:
+            # one independent chain per worker instead of --trials restarts
+            trials = workers
+        limit = f"{time_limit:g}s" if time_limit is not None else f"{max_kicks} kicks"
+        print(f"{optimizer} mode: {trials} chain(s), {limit} each")
+
     sweep_mode = getattr(args, "sweep_terminals", False)
     # Guard: sweep-terminals and endless mode are incompatible — prefer sweep
     if sweep_mode and endless_mode:
@@ -1302,138 +2295,82 @@ def main(args):
     else:
         trial_starts = [None] * trials
 
+    # one compact line per trial (seed, start, total); full routes are only
+    # kept for the top_k candidates
+    trial_log_path = getattr(args, "trial_log", None)
+    if trial_log_path is None and endless_mode:
+        trial_log_path = os.path.join("datasets", "last_trials.jsonl")
+    trial_log = None
+    if trial_log_path:
+        try:
+            trial_log = open(trial_log_path, "w")
+        except OSError as e:
+            print(f"Couldn't open trial log {trial_log_path}: {e}")
+
+    trial_results = None
     try:
         success_candidate = None
 
-        for t in range(trials):
-            
-            cutoff_dt = datetime.combine(base_trial_date, time(4, 0))
-
-            if sweep_mode:
-                forced_start_node = trial_starts[t]
-                trial_start_name = secondary.get(forced_start_node, forced_start_node)
-                if not endless_mode:
-                    print(f"Trial {t+1}/{trials}: starting at {trial_start_name} ({forced_start_node})")
+        trial_env = {
+            "graph": intern_timetable_ids(ArrayGraph(graph), secondary, timetables),
+            "secondary": secondary,
+            "timetables": timetables,
+            "unique_nodes": unique_nodes,
+            "base_paths": base_paths,
+            "noise": noise,
+            "parsed_start_dt": parsed_start_dt,
+            "base_trial_date": base_trial_date,
+            "no_two_opt": no_two_opt,
+            "two_opt_iters": two_opt_iters,
+            "local_search": getattr(args, "local_search", "two-opt"),
+            "construction": getattr(args, "construction", "christofides"),
+            "chains": chains,
+            "timing_cache": timing_cache,
+            "optimizer": optimizer,
+            "time_limit": time_limit,
+            "max_kicks": max_kicks,
+            "verbose": args.verbose,
+            "moves": moves,
+            "neighbors": int(getattr(args, "neighbors", 8)),
+            "sweep_window": sweep_window,
+            "transfer_buffer_minutes": transfer_buffer_minutes,
+            "use_congestion": use_congestion,
+            "hub_extra_minutes": hub_extra_minutes,
+        }
 
-            # deterministic trial RNG — use replay seed if provided for exact reproduction
-            if replay_seed is not None:
-                trial_seed = int(replay_seed)
-            else:
-                trial_seed = rng_master.randint(0, 2**31 - 1)
-            
-            trial_rng = random.Random(trial_seed)
-            perturb_rng = random.Random(trial_rng.randint(0, 2**31 - 1))
-            routing_rng = random.Random(trial_rng.randint(0, 2**31 - 1))
-            del trial_rng  # prevent accidental reuse
-
-            # perturb graph weights for search only
-            pert_graph = perturb_graph_weights(graph, noise, perturb_rng) if noise > 0 else graph
-
-            # compute candidate route from perturbed graph
-            # Shuffle the precomputed unique node list per-trial so the
-            # TSP heuristic explores different node orderings each run.
-            shuffled_nodes = unique_nodes[:]
-            try:
-                routing_rng.shuffle(shuffled_nodes)
-            except Exception:
-                # Fallback: use Python's random.shuffle if Random.shuffle isn't available
-                random.shuffle(shuffled_nodes)
-
-            # Remove Oedo nodes from the TSP and represent Oedo as a single anchor (E28).
-            non_oedo_nodes = [n for n in shuffled_nodes if not (isinstance(n, str) and n.startswith("E"))]
-            oedo_anchor = "E28" if "E28" in pert_graph.nodes() else next((n for n in shuffled_nodes if isinstance(n, str) and n.startswith("E")), None)
-            tsp_nodes = non_oedo_nodes + ([oedo_anchor] if oedo_anchor else [])
-
-            candidate_route = simulate_grand_tour(
-                pert_graph,
-                secondary,
-                unique_nodes=tsp_nodes,
-                start_node=forced_start_node,
-                rng=routing_rng,
+        def trial_jobs():
+            trial_seed = None
+            for t in range(trials):
+                start_node = forced_start_node
+                if sweep_mode:
+                    start_node = trial_starts[t]
+                    trial_start_name = secondary.get(start_node, start_node)
+                    if not endless_mode:
+                        print(f"Trial {t+1}/{trials}: starting at {trial_start_name} ({start_node})")
+
+                # deterministic trial RNG — use replay seed if provided for exact reproduction
+                if replay_seed is not None:
+                    trial_seed = int(replay_seed)
+                elif not sweep_mode or t % len(terminal_nodes) == 0:
+                    # sweep mode: one seed (noise + base tour) per repeat,
+                    # shared by all its terminals (see _trial_base_tour)
+                    trial_seed = rng_master.randint(0, 2**31 - 1)
+                yield t, trial_seed, start_node
+
+        if workers > 1:
+            trial_results = run_trials_parallel(trial_jobs(), trial_env, workers)
+        else:
+            trial_results = (
+                (t, trial_seed, start_node, run_trial(trial_seed, start_node, trial_env))
+                for t, trial_seed, start_node in trial_jobs()
             )
-            # Splice the full Oedo subpath into the candidate where the anchor appears
-            if candidate_route and oedo_anchor and oedo_anchor in candidate_route:
-                oedo_sub = get_oedo_subpath(graph)
-                splice_idx = candidate_route.index(oedo_anchor)
-                candidate_route = (
-                    candidate_route[:splice_idx]
-                    + oedo_sub
-                    + candidate_route[splice_idx + 1 :]
-                )
-
-            # determine start_dt for this candidate
-            if parsed_start_dt and parsed_start_dt >= cutoff_dt:
-                candidate_start_dt = parsed_start_dt
-            else:
-                start_node = candidate_route[0]
-                start_line_name = LETTER_TO_LINE.get(start_node[0], "")
-                tt_file = _find_timetable_file_for_line(start_line_name, timetables)
-                if tt_file:
-                    trips = timetables.get(tt_file, [])
-                    from_name = secondary.get(start_node, None)
-                    from_norm = _norm(from_name)
-                    dep_dt, tripid = find_first_departure_from_station(trips, from_norm, cutoff_dt)
-                    candidate_start_dt = dep_dt if dep_dt else cutoff_dt
-                else:
-                    candidate_start_dt = cutoff_dt
-
-            # refine with two-opt (validated against timed objective)
-            if not no_two_opt:
-                try:
-                    refined_route, refined_timed = two_opt(
-                        candidate_route, graph, secondary, timetables,
-                        candidate_start_dt, max_iters=two_opt_iters, rng=routing_rng,
-                        transfer_buffer_minutes=transfer_buffer_minutes,
-                        use_congestion=use_congestion,
-                        hub_extra_minutes=hub_extra_minutes,
-                    )
-                except Exception:
-                    refined_route = candidate_route
-                    refined_timed = compute_timed_route(
-                        candidate_route, graph, secondary, timetables, candidate_start_dt,
-                        transfer_buffer_minutes=transfer_buffer_minutes,
-                        use_congestion=use_congestion,
-                        hub_extra_minutes=hub_extra_minutes,
-                    )
-            else:
-                refined_route = candidate_route
-                refined_timed = compute_timed_route(
-                    candidate_route, graph, secondary, timetables, candidate_start_dt,
-                    transfer_buffer_minutes=transfer_buffer_minutes,
-                    use_congestion=use_congestion,
-                    hub_extra_minutes=hub_extra_minutes,
-                )
-
-            # two-opt refinement complete. Oedo continuity is enforced
-            # by injecting the full Oedo subpath before two-opt, so no
-            # additional fragmentation warnings are necessary here.
-
-            # Optionally sweep start times for this fixed route to find the best start
-            if getattr(args, "sweep_starts", False):
-                sf = getattr(args, "sweep_start_from", "04:00")
-                st = getattr(args, "sweep_start_to", "10:00")
-                step = int(getattr(args, "sweep_start_step", 15))
-                from_dt = _parse_time_with_date(sf, base_trial_date)
-                to_dt = _parse_time_with_date(st, base_trial_date)
-                if from_dt is None:
-                    from_dt = cutoff_dt
-                if to_dt is None:
-                    to_dt = datetime.combine(base_trial_date, time(10, 0))
-                if from_dt < cutoff_dt:
-                    from_dt = cutoff_dt
-                if to_dt < from_dt:
-                    to_dt = from_dt
-                best_total, best_start_dt, best_timed = sweep_start_times(
-                    refined_route, graph, secondary, timetables, from_dt, to_dt, step,
-                    transfer_buffer_minutes=transfer_buffer_minutes,
-                    use_congestion=use_congestion,
-                    hub_extra_minutes=hub_extra_minutes,
-                )
-                if best_total is not None:
-                    refined_timed = best_timed
-                    candidate_start_dt = best_start_dt
 
-            total_min = total_minutes_from_timed(refined_timed)  # ✅ always defined
+        for t, trial_seed, start_node, result in trial_results:
+            candidate_route = result["candidate_route"]
+            refined_route = result["route"]
+            refined_timed = result["timed"]
+            candidate_start_dt = result["start_dt"]
+            total_min = result["total_min"]
 
             # Per-trial one-line summary when running in endless mode
             if endless_mode:
@@ -1459,6 +2396,16 @@ def main(args):
                 else:
                     print(f"{trial_start_name} ({trial_start_node}) — {time_str} — seed={trial_seed} — date={base_trial_date.isoformat()}")
 
+            if trial_log is not None:
+                trial_log.write(json.dumps({
+                    "trial": t,
+                    "seed": trial_seed,
+                    "start": candidate_route[0] if candidate_route else None,
+                    "start_dt": candidate_start_dt.isoformat() if candidate_start_dt else None,
+                    "total_min": total_min,
+                }) + "\n")
+                trial_log.flush()
+
             if total_min is None:
                 continue
 
@@ -1468,10 +2415,14 @@ def main(args):
                 "timed": refined_timed,
                 "start_dt": candidate_start_dt,
                 "trial_seed": trial_seed,
+                "trial": t,
+                "kicks": result["kicks"],
                 "noise": noise,
+                "start_node": start_node,
             }
-            candidates.append(candidate)
-            if best_endless_candidate is None or total_min < best_endless_candidate["total_min"]:
+            _keep_candidate(candidates, candidate, max(1, top_k))
+            # ties go to the earlier trial so parallel runs pick the same winner
+            if best_endless_candidate is None or _candidate_rank(candidate) < _candidate_rank(best_endless_candidate):
                 best_endless_candidate = candidate
 
             # If in endless mode and threshold reached, stop early and use this candidate
@@ -1481,6 +2432,15 @@ def main(args):
                 break
     except KeyboardInterrupt:
         print("Interrupted by user; processing candidates found so far...")
+    finally:
+        # stop any trials still queued on the worker pool
+        if trial_results is not None:
+            trial_results.close()
+        if trial_log is not None:
+            trial_log.close()
+
+    if args.verbose and timing_cache is not None and workers == 1:
+        print(f"Timing cache: {timing_cache.stats()}")
 
     if endless_mode and best_endless_candidate is not None:
         best_min = best_endless_candidate["total_min"]
@@ -1497,9 +2457,8 @@ def main(args):
     if success_candidate is not None:
         best_candidate = success_candidate
     else:
-        # sort and keep top-k best by timed total
-        candidates.sort(key=lambda c: c["total_min"])  # ascending
-        top_candidates = candidates[:top_k]
+        # top-k best by timed total, ascending
+        top_candidates = _ranked_candidates(candidates)
         best_candidate = top_candidates[0]
 
     # adopt best candidate
@@ -1733,7 +2692,7 @@ def main(args):
         print(f"\nRepro Trial Seed: {repro_seed}")
         if seed is not None:
             print(f"Master Seed: {seed}")
-        print(f"To reproduce this run exactly: python programs/tube_challenge.py --replay-trial-seed {repro_seed} --date {base_trial_date.isoformat()}")
+        print(f"To reproduce this run exactly: python programs/tube_challenge.py --replay-trial-seed {repro_seed} --date {base_trial_date.isoformat()}{_repro_flags(args, best_candidate)}")
     print(f"\nWorld Record: {format_timedelta_hms(WORLD_RECORD_DELTA)}")
     
     # Save last route data for external inspection (JSON)
@@ -1813,6 +2772,61 @@ def parse_args():
         default=200,
         help="Max iterations for two-opt local search (default 200)",
     )
+    parser.add_argument(
+        "--construction",
+        dest="construction",
+        choices=list(CONSTRUCTIONS),
+        default="christofides",
+        help="Tour constructor for each trial's starting route (default christofides)",
+    )
+    parser.add_argument(
+        "--no-chain-contraction",
+        action="store_true",
+        dest="no_chain_contraction",
+        help="Give every station to the TSP instead of one anchor per same-line chain",
+    )
+    parser.add_argument(
+        "--local-search",
+        dest="local_search",
+        choices=["two-opt", "sweep"],
+        default="two-opt",
+        help="Refinement: random two-opt sampling, or a deterministic neighbor-list sweep over --moves (default two-opt)",
+    )
+    parser.add_argument(
+        "--moves",
+        dest="moves",
+        type=str,
+        default=",".join(MOVE_KINDS),
+        help=f"Comma-separated moves for --local-search sweep (default {','.join(MOVE_KINDS)})",
+    )
+    parser.add_argument(
+        "--neighbors",
+        dest="neighbors",
+        type=int,
+        default=8,
+        help="Nearest route nodes considered per node by --local-search sweep (default 8)",
+    )
+    parser.add_argument(
+        "--optimizer",
+        dest="optimizer",
+        choices=["anneal", "ils"],
+        default=None,
+        help="Keep improving each trial's tour with double-bridge kicks plus local search (iterated local search or simulated annealing)",
+    )
+    parser.add_argument(
+        "--time-limit",
+        dest="time_limit",
+        type=float,
+        default=None,
+        help=f"Seconds per --optimizer chain (default {DEFAULT_OPTIMIZER_SECONDS} unless --max-kicks is set)",
+    )
+    parser.add_argument(
+        "--max-kicks",
+        dest="max_kicks",
+        type=int,
+        default=None,
+        help="Stop each --optimizer chain after N kicks (reproduces a chain exactly)",
+    )
     parser.add_argument(
         "--no-two-opt",
         action="store_true",
@@ -1877,6 +2891,14 @@ def parse_args():
         default=100000,
         help="Safety cap for endless mode (default 100000)",
     )
+    parser.add_argument(
+        "--trial-log",
+        dest="trial_log",
+        type=str,
+        default=None,
+        help="Write one JSON line per trial (seed, start, total) to this file "
+             "(default datasets/last_trials.jsonl in endless mode)",
+    )
     parser.add_argument(
         "--json",
         action="store_true",
@@ -1890,6 +2912,13 @@ def parse_args():
         default=None,
         help="Date for timetable lookups in YYYY-MM-DD format (default: today)",
     )
+    parser.add_argument(
+        "--service-day",
+        dest="service_day",
+        choices=sorted(SERVICE_CALENDARS),
+        default=None,
+        help="Timetable service calendar to use (default: from --date; pass 'holiday' for public holidays)",
+    )
     parser.add_argument(
         "--sweep-terminals",
         action="store_true",
@@ -1950,6 +2979,26 @@ def parse_args():
         default=15,
         help="Step in minutes between probed starts (default 15)",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        dest="workers",
+        default=1,
+        help="Run trials in parallel on N worker processes (0 = one per CPU, default 1)",
+    )
+    parser.add_argument(
+        "--timing-cache-size",
+        dest="timing_cache_size",
+        type=int,
+        default=TIMING_CACHE_SIZE,
+        help=f"Timed route blocks kept in memory for reuse across trials and start sweeps; 0 disables (default {TIMING_CACHE_SIZE})",
+    )
+    parser.add_argument(
+        "--no-timetable-cache",
+        action="store_true",
+        dest="no_timetable_cache",
+        help="Always parse timetable JSON instead of using the compiled cache in datasets/timetables/.cache",
+    )
     parser.add_argument(
         "--refill-stops",
         action="store_true",